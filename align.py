@@ -0,0 +1,313 @@
+"""Word timestamps for a book whose text is already known, without transcribing it.
+
+When the book's text is at hand (a plain-text file or an EPUB), decoding the
+audio with Whisper is both the most expensive step and a worse transcript
+than the text itself. Instead, the text is aligned to the audio: for each
+window of up to WINDOW_SECONDS, the next stretch of text is run through the
+model in a single forward pass, and whisper.timing.find_alignment places its
+words on the audio from the cross-attention (the same method whisper uses for
+its own word timestamps). That costs about one decoding step per window
+instead of one per token.
+
+Windows are anchored on confident matches: only the words up to the last run
+of ANCHOR_RUN words the model found likely (and that end clear of the
+window's edge, where surplus text is squeezed) are kept, and the next window
+starts right after them. Where the text does not fit the audio (front matter,
+an intro the text lacks, footnotes), the window is transcribed instead, and
+the text is searched for the recognised words to pick up again; text that is
+never spoken is left out of the result.
+
+    python align.py output/YourBook1/YourBook1.wav input/YourBook1.epub
+
+writes YourBook1.json and YourBook1.txt next to the WAV, in the same format
+as a transcription.
+"""
+import argparse
+import difflib
+import html.parser
+import os
+import posixpath
+import xml.etree.ElementTree as ElementTree
+import zipfile
+
+import numpy as np
+
+from batch_decode import model_tokenizer
+from common import SEEK_FRAMES_PER_SECOND
+from search_index import normalize
+
+BOOK_TEXT_EXTENSIONS = (".epub", ".txt")
+WINDOW_SECONDS = 25  # Audio aligned at once; whisper sees at most 30 s
+ANCHOR_PROBABILITY = 0.4  # Words the model finds at least this likely count as confident
+ANCHOR_RUN = 3  # Consecutive confident words that make an anchor
+EDGE_SECONDS = 2.0  # Words ending this close to a window's end are aligned again in the next window
+WORDS_PER_SECOND = 2.7  # First guess of the speaking rate, refined as the book is aligned
+TEXT_SLACK = 1.5  # Share of extra text given to each window in case speech is faster than the guess
+MAX_TEXT_TOKENS = 400  # Whisper's decoder takes 448 tokens, including its prompt
+SEARCH_WORDS = 5000  # How far ahead the text is searched when it stops fitting the audio
+MAX_SEGMENT_WORDS = 60
+
+class _TextExtractor(html.parser.HTMLParser):
+    """Collects the text of an XHTML document, with a line break at each block element."""
+    BLOCKS = {'p', 'div', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'section'}
+    SKIPPED = {'script', 'style', 'head'}
+
+    def __init__(self):
+        super().__init__()
+        self.pieces = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED:
+            self.skipping += 1
+        elif tag in self.BLOCKS:
+            self.pieces.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in self.BLOCKS:
+            self.pieces.append('\n')
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.pieces.append(data)
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+def read_epub_text(epub_path):
+    """Return the text of an EPUB's documents in reading (spine) order."""
+    with zipfile.ZipFile(epub_path) as epub:
+        container = ElementTree.fromstring(epub.read('META-INF/container.xml'))
+        opf_path = next(element.get('full-path') for element in container.iter()
+                        if _local_name(element.tag) == 'rootfile')
+        package = ElementTree.fromstring(epub.read(opf_path))
+        hrefs = {element.get('id'): element.get('href') for element in package.iter()
+                 if _local_name(element.tag) == 'item'}
+        texts = []
+        for element in package.iter():
+            if _local_name(element.tag) != 'itemref' or element.get('idref') not in hrefs:
+                continue
+            document_path = posixpath.normpath(posixpath.join(posixpath.dirname(opf_path), hrefs[element.get('idref')]))
+            extractor = _TextExtractor()
+            extractor.feed(epub.read(document_path).decode('utf-8', errors='replace'))
+            texts.append(''.join(extractor.pieces))
+    return '\n'.join(texts)
+
+def read_book_text(text_path):
+    """Return the words of a plain-text or EPUB book, split on whitespace."""
+    if text_path.lower().endswith('.epub'):
+        text = read_epub_text(text_path)
+    else:
+        with open(text_path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+    return text.split()
+
+def find_book_text(folder, name):
+    """Return the text file of a book next to its audio (<name>.epub or <name>.txt), if there is one."""
+    for ext in BOOK_TEXT_EXTENSIONS:
+        path = os.path.join(folder, name + ext)
+        if os.path.isfile(path):
+            return path
+    return None
+
+def _candidate(tokenizer, words, position, count):
+    """Take up to count words from position on, as many as fit in MAX_TEXT_TOKENS; returns (words, tokens)."""
+    count = max(1, count)
+    while True:
+        candidate = words[position:position + count]
+        tokens = tokenizer.encode(''.join(' ' + word for word in candidate))
+        if len(tokens) <= MAX_TEXT_TOKENS or count == 1:
+            return candidate, tokens[:MAX_TEXT_TOKENS]
+        count = max(1, count * MAX_TEXT_TOKENS // len(tokens) - 1)
+
+def _place_words(timings, candidate):
+    """Map whisper's word timings back onto the candidate words; returns [(start, end, probability)].
+
+    Whisper splits the text into its own words (punctuation apart, for
+    instance), so its timings are matched to the words by character offset.
+    """
+    import bisect
+
+    word_starts = np.cumsum([0] + [len(word) + 1 for word in candidate[:-1]]).tolist()
+    spans = [[None, None, []] for _ in candidate]
+    offset = 0
+    for timing in timings:
+        number = max(0, bisect.bisect_right(word_starts, offset) - 1)
+        span = spans[number]
+        span[0] = timing.start if span[0] is None else min(span[0], timing.start)
+        span[1] = timing.end if span[1] is None else max(span[1], timing.end)
+        span[2].append(timing.probability)
+        offset += len(timing.word)
+
+    placed, previous_end = [], 0.0
+    for start, end, probabilities in spans:
+        if start is None:
+            # Not reached by the timings; give it no length where the previous word ended
+            start = end = previous_end
+        placed.append((float(start), float(end), float(np.mean(probabilities)) if probabilities else 0.0))
+        previous_end = end
+    return placed
+
+def _last_anchor(placed, limit, last_allowed):
+    """Index of the last word ending by limit that closes a run of ANCHOR_RUN confident words, or None.
+
+    The window must also open with a run of confident words, or the text
+    does not continue here. With fewer than ANCHOR_RUN words (the end of the
+    text), all of them must be confident.
+    """
+    run = min(ANCHOR_RUN, len(placed))
+    if any(probability < ANCHOR_PROBABILITY for _, _, probability in placed[:run]):
+        return None
+    for index in range(min(last_allowed, len(placed) - 1), run - 2, -1):
+        if placed[index][1] > limit:
+            continue
+        if all(probability >= ANCHOR_PROBABILITY for _, _, probability in placed[index - run + 1:index + 1]):
+            return index
+    return None
+
+def _find_in_text(model, samples, words, position, language):
+    """Transcribe a window and find its longest run of words in the text ahead of position.
+
+    Returns [(word index, start, end, probability)] for the run, or None when
+    no ANCHOR_RUN words of the window appear in the text.
+    """
+    import whisper_timestamped as whisper
+
+    result = whisper.transcribe(model, samples.astype(np.float32) / 32768.0, language=language)
+    recognized = [word for segment in result['segments'] for word in segment.get('words', [])]
+    text = [normalize(word) for word in words[position:position + SEARCH_WORDS]]
+    matcher = difflib.SequenceMatcher(None, [normalize(word['text']) for word in recognized], text)
+    first_recognized, first_text, size = matcher.find_longest_match(0, len(recognized), 0, len(text))
+    if size < ANCHOR_RUN:
+        return None
+    return [(position + first_text + k, recognized[first_recognized + k]['start'],
+             recognized[first_recognized + k]['end'], recognized[first_recognized + k].get('confidence', 0.0))
+            for k in range(size)]
+
+def align_words(model, words, read_span, duration, language='en'):
+    """Place words on the audio, window by window; see the module docstring.
+
+    read_span(start, end) returns the int16 samples between two times in
+    seconds. Returns [(word index, start, end, probability)] in order, for
+    the words that were found in the audio.
+    """
+    import torch
+    from whisper.audio import HOP_LENGTH, log_mel_spectrogram, pad_or_trim
+    from whisper.timing import find_alignment
+
+    tokenizer = model_tokenizer(model, language)
+    aligned = []
+    position, window_start = 0, 0.0
+    words_per_second = WORDS_PER_SECOND
+    while position < len(words) and duration - window_start > 0.1:
+        window_end = min(duration, window_start + WINDOW_SECONDS)
+        samples = read_span(window_start, window_end)
+        if len(samples) < HOP_LENGTH:
+            break
+        mel = log_mel_spectrogram(pad_or_trim(torch.from_numpy(samples.astype(np.float32) / 32768.0)),
+                                  model.dims.n_mels).to(model.device)
+        count = int((window_end - window_start) * words_per_second * TEXT_SLACK) + ANCHOR_RUN + 2
+        candidate, tokens = _candidate(tokenizer, words, position, count)
+        placed = _place_words(find_alignment(model, tokenizer, tokens, mel, len(samples) // HOP_LENGTH), candidate)
+
+        # Unless the audio or the text ends here, the last words and those at the window's
+        # edge may just be surplus text squeezed into the end of the window
+        ends_here = window_end >= duration or position + len(candidate) >= len(words)
+        limit = window_end - window_start - (0.0 if ends_here else EDGE_SECONDS)
+        anchor = _last_anchor(placed, limit, len(placed) - 1 if ends_here else len(placed) - 3)
+        if anchor is not None:
+            aligned.extend((position + k, window_start + start, window_start + end, probability)
+                           for k, (start, end, probability) in enumerate(placed[:anchor + 1]))
+            spoken_seconds = placed[anchor][1]
+            if spoken_seconds > 1.0:
+                words_per_second = 0.7 * words_per_second + 0.3 * (anchor + 1) / spoken_seconds
+            position += anchor + 1
+            window_start += spoken_seconds
+            continue
+
+        # The text does not fit this audio: look for what was said further on in the text
+        found = _find_in_text(model, samples, words, position, language)
+        if found is None:
+            # None of the text is spoken here (music, credits, an intro)
+            window_start = window_end
+            continue
+        skipped = found[0][0] - position
+        if skipped:
+            print(f"Text not found in the audio at {window_start:.0f}s: skipped {skipped} words "
+                  f"from \"{' '.join(words[position:position + 8])}\"")
+        aligned.extend((index, window_start + start, window_start + end, probability)
+                       for index, start, end, probability in found)
+        position = found[-1][0] + 1
+        window_start += max(found[-1][2], 0.1)
+
+    if position < len(words):
+        print(f"{len(words) - position} words at the end of the text were not found in the audio")
+    return aligned
+
+def build_result(words, aligned, language):
+    """Turn aligned words into a whisper-style result, one segment per sentence."""
+    segments = []
+    current = []
+    previous_index, previous_end = None, 0.0
+
+    def close_segment():
+        if current:
+            segments.append({
+                'id': len(segments),
+                'seek': int(round(current[0]['start'] * SEEK_FRAMES_PER_SECOND)),
+                'start': current[0]['start'],
+                'end': current[-1]['end'],
+                'text': ' ' + ' '.join(word['text'] for word in current),
+                'words': list(current),
+                'confidence': round(float(np.mean([word['confidence'] for word in current])), 3),
+            })
+            current.clear()
+
+    for index, start, end, probability in aligned:
+        if previous_index is not None and index != previous_index + 1:
+            # Text left out between these words
+            close_segment()
+        start = max(start, previous_end)
+        end = max(end, start)
+        current.append({'text': words[index], 'start': round(start, 2), 'end': round(end, 2),
+                        'confidence': round(probability, 3)})
+        if words[index].rstrip('"\'”’)]').endswith(('.', '!', '?')) or len(current) >= MAX_SEGMENT_WORDS:
+            close_segment()
+        previous_index, previous_end = index, end
+    close_segment()
+    return {'text': ''.join(segment['text'] for segment in segments), 'segments': segments, 'language': language}
+
+def align_wav(model, wav_path, text_path, language='en'):
+    """Align the text of a book (see read_book_text) to its 16 kHz WAV and return a whisper-style result."""
+    from transcribe import read_wav_span, wav_duration
+
+    words = read_book_text(text_path)
+    aligned = align_words(model, words, lambda start, end: read_wav_span(wav_path, start, end),
+                          wav_duration(wav_path), language)
+    print(f"Aligned {len(aligned)} of {len(words)} words of {text_path}")
+    return build_result(words, aligned, language)
+
+def main():
+    import metrics
+    import transcribe
+
+    parser = argparse.ArgumentParser(description="Time the words of a known book text against its audio.")
+    parser.add_argument('wav', help="16 kHz mono WAV of the book, e.g. output/YourBook1/YourBook1.wav")
+    parser.add_argument('text', help="The book's text, as a .txt or .epub file")
+    parser.add_argument('--model', default=transcribe.model_name)
+    parser.add_argument('--language', default=transcribe.language)
+    args = parser.parse_args()
+
+    model = transcribe.load_whisper_model(args.model)
+    if model is None:
+        return
+    base_path = os.path.splitext(args.wav)[0]
+    result = transcribe.align_wav_file(args.wav, args.text, model, args.language)
+    transcribe.save_transcription(result, f"{base_path}.txt", f"{base_path}.json")
+    print(f"Alignment created: {args.wav} -> {base_path}.txt & {base_path}.json")
+    metrics.write_book_metrics(os.path.basename(base_path), os.path.dirname(args.wav) or '.')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Batched decoding of several 30-second windows at once with openai-whisper.
+
+whisper.transcribe (which whisper_timestamped wraps) works through the audio
+one 30-second window at a time, so every decoding step is a batch-1 forward
+pass that leaves most of a many-core CPU's matrix throughput unused. Here a
+chunk is cut at quiet points into independent windows of under 30 seconds,
+and batch_size windows are encoded and decoded together in one forward pass
+per token. Word timestamps are then added per window from whisper's own
+cross-attention alignment (whisper.timing).
+
+The result follows the whisper_timestamped schema (segments with words
+carrying text, start, end and confidence), with one segment per window.
+Windows are decoded greedily without conditioning on the previous window,
+since that text is not known while the batch is decoded.
+"""
+import numpy as np
+
+from common import SAMPLE_RATE, SEEK_FRAMES_PER_SECOND
+
+WINDOW_SECONDS = 24  # Target window length; cuts are searched within WINDOW_SEARCH_SECONDS of it
+WINDOW_SEARCH_SECONDS = 5  # Windows stay under whisper's 30 s input
+# whisper.transcribe's rule for windows that contain no speech
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+def model_tokenizer(model, language):
+    """Return whisper's transcription tokenizer for a loaded model."""
+    from whisper.tokenizer import get_tokenizer
+
+    # Newer whisper releases need the language count of the model (large-v3 has one more)
+    extra = {'num_languages': model.num_languages} if hasattr(model, 'num_languages') else {}
+    return get_tokenizer(model.is_multilingual, language=language, task='transcribe', **extra)
+
+def _window_result(model, tokenizer, mel, decoded, sample_count):
+    """Turn one decoded window into a segment with word timestamps, on the window's own timeline."""
+    from whisper.audio import HOP_LENGTH
+    from whisper.timing import add_word_timestamps
+
+    if decoded.no_speech_prob > NO_SPEECH_THRESHOLD and decoded.avg_logprob < LOGPROB_THRESHOLD:
+        return None
+    tokens = [token for token in decoded.tokens if token < tokenizer.eot]
+    if not tokens:
+        return None
+    segment = {
+        'seek': 0,
+        'start': 0.0,
+        'end': round(sample_count / SAMPLE_RATE, 2),
+        'text': ' ' + decoded.text.strip(),
+        'tokens': tokens,
+        'temperature': decoded.temperature,
+        'avg_logprob': decoded.avg_logprob,
+        'compression_ratio': decoded.compression_ratio,
+        'no_speech_prob': decoded.no_speech_prob,
+    }
+    add_word_timestamps(segments=[segment], model=model, tokenizer=tokenizer, mel=mel,
+                        num_frames=sample_count // HOP_LENGTH, last_speech_timestamp=0.0)
+    words = [{
+        'text': word['word'].strip(),
+        'start': round(word['start'], 2),
+        'end': round(word['end'], 2),
+        'confidence': round(float(word['probability']), 3),
+    } for word in segment.pop('words', [])]
+    if words:
+        segment['start'], segment['end'] = words[0]['start'], words[-1]['end']
+        segment['confidence'] = round(float(np.mean([word['confidence'] for word in words])), 3)
+    segment['words'] = words
+    return segment
+
+def transcribe_windows(model, windows, language, batch_size=8):
+    """Transcribe (offset_seconds, int16 samples) windows of under 30 s, batch_size at a time.
+
+    Returns one whisper-style result with the times of every window shifted by
+    its offset, in window order.
+    """
+    import torch
+    import whisper
+    from whisper.audio import log_mel_spectrogram, pad_or_trim
+
+    tokenizer = model_tokenizer(model, language)
+    options = whisper.DecodingOptions(language=language, task='transcribe', temperature=0.0,
+                                      without_timestamps=True, fp16=model.device.type == 'cuda')
+    result = {'text': '', 'segments': [], 'language': language}
+    windows = list(windows)
+    for first in range(0, len(windows), batch_size):
+        batch = windows[first:first + batch_size]
+        mels = torch.stack([
+            log_mel_spectrogram(pad_or_trim(torch.from_numpy(samples.astype(np.float32) / 32768.0)),
+                                model.dims.n_mels)
+            for _, samples in batch
+        ]).to(model.device)
+        with torch.no_grad():
+            decoded = whisper.decode(model, mels, options)
+
+        for (offset, samples), mel, window_decoded in zip(batch, mels, decoded):
+            segment = _window_result(model, tokenizer, mel, window_decoded, len(samples))
+            if segment is None:
+                continue
+            segment['id'] = len(result['segments'])
+            segment['seek'] = int(round(offset * SEEK_FRAMES_PER_SECOND))
+            segment['start'] = round(segment['start'] + offset, 2)
+            segment['end'] = round(segment['end'] + offset, 2)
+            for word in segment['words']:
+                word['start'] = round(word['start'] + offset, 2)
+                word['end'] = round(word['end'] + offset, 2)
+            result['segments'].append(segment)
+            result['text'] += segment['text']
+    return result
@@ -0,0 +1,292 @@
+"""Benchmarks of the player and the transcription pipeline on synthetic books.
+
+Transcripts of growing size (10k to 2M words by default) are generated in
+whisper's JSON format, and audio is generated from tones separated by short
+silences, so no audiobook or network access is needed. Measured:
+
+    load_transcription   parsing the JSON into a WordTable
+    load_word_index      memory-mapping the .words.bin index
+    find_current_word    one lookup at a random time (and find_many per time)
+    tk_render            inserting a window of the transcript into a Text widget
+    tk_highlight         moving the highlight word by word through the book
+    convert_audio        ffmpeg conversion throughput (audio seconds per second)
+    transcribe           chunking, merging and saving with a stubbed model that
+                         returns synthetic words instead of running whisper
+    batch_transcribe     (only with --compare-batch) real inference throughput
+                         of whisper's one-window-at-a-time path (batch size 1)
+                         against batched decoding, on a speech WAV you provide
+
+Results are written as JSON; pass --baseline with an earlier results file to
+compare. The Tk benchmarks need a display; on a headless machine run the suite
+under a virtual one:
+
+    python benchmark.py
+    python benchmark.py --sizes 10000 100000 --output after.json --baseline before.json
+    xvfb-run python benchmark.py
+    python benchmark.py --skip load convert transcribe --compare-batch speech.wav --batch-sizes 1 4 8
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import types
+import wave
+
+import numpy as np
+
+import transcribe
+from transcript_index import load_word_index, write_word_index
+from transcript_view import TranscriptView
+
+DEFAULT_SIZES = (10000, 100000, 500000, 1000000, 2000000)
+WORDS_PER_SEGMENT = 12
+WORD_SECONDS = 0.3  # Length of each synthetic word, followed by a 0.1 s gap
+VOCABULARY = ("the", "a", "of", "and", "to", "in", "was", "he", "she", "it", "that", "his", "her",
+              "with", "said", "had", "for", "on", "at", "by", "not", "but", "from", "they", "which",
+              "philosophy", "remarkable", "afterwards", "nevertheless", "Mr.", "Holmes,", "Watson.")
+
+def synthetic_result(word_count, seed=0):
+    """Return a whisper-style result with word_count words, 2.5 words per second."""
+    rng = np.random.default_rng(seed)
+    choices = rng.integers(0, len(VOCABULARY), size=word_count)
+    segments = []
+    for first in range(0, word_count, WORDS_PER_SEGMENT):
+        words = []
+        for i in range(first, min(first + WORDS_PER_SEGMENT, word_count)):
+            start = round(i * (WORD_SECONDS + 0.1), 2)
+            words.append({'text': VOCABULARY[choices[i]], 'start': start,
+                          'end': round(start + WORD_SECONDS, 2), 'confidence': 0.9})
+        text = ' ' + ' '.join(word['text'] for word in words)
+        segments.append({'id': len(segments), 'seek': int(words[0]['start'] * 100),
+                         'start': words[0]['start'], 'end': words[-1]['end'], 'text': text, 'words': words})
+    return {'text': ''.join(segment['text'] for segment in segments), 'segments': segments, 'language': 'en'}
+
+def write_tone_wav(path, seconds, sample_rate=44100, channels=2, block_seconds=10):
+    """Write a 16-bit WAV of tones of changing pitch, each followed by a short silence."""
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        written = 0
+        total = int(seconds * sample_rate)
+        while written < total:
+            count = min(int(block_seconds * sample_rate), total - written)
+            t = (written + np.arange(count)) / sample_rate
+            # 0.8 s tones at a pitch that changes every tone, then 0.2 s of silence
+            pitch = 220.0 + 110.0 * (np.floor(t) % 5)
+            samples = np.where(t % 1.0 < 0.8, 0.3 * np.sin(2 * np.pi * pitch * t), 0.0)
+            pcm = (samples * 32767).astype('<i2')
+            wav.writeframes(np.repeat(pcm, channels).tobytes())
+            written += count
+
+def timed(function, repeat=3):
+    """Run function repeat times; return the median wall time in seconds and the last result."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+def _stub_transcribe(model, audio, language=None, **kwargs):
+    """Stand-in for whisper_timestamped.transcribe: 2.5 synthetic words per second of audio."""
+    if isinstance(audio, str):
+        duration = transcribe.wav_duration(audio)
+    else:
+        duration = len(audio) / transcribe.SAMPLE_RATE
+    result = synthetic_result(int(duration / (WORD_SECONDS + 0.1)))
+    result['language'] = language
+    return result
+
+@contextlib.contextmanager
+def stubbed_whisper():
+    """Replace whisper_timestamped with the stub for the duration of the block."""
+    stub = types.ModuleType('whisper_timestamped')
+    stub.transcribe = _stub_transcribe
+    stub.load_model = lambda name, device='cpu': 'stub'
+    saved = sys.modules.get('whisper_timestamped')
+    sys.modules['whisper_timestamped'] = stub
+    try:
+        yield
+    finally:
+        if saved is None:
+            del sys.modules['whisper_timestamped']
+        else:
+            sys.modules['whisper_timestamped'] = saved
+
+def bench_loading(json_path, results, size):
+    # display imports VLC, so only load it for the benchmarks that need it
+    from display import load_transcription
+
+    seconds, table = timed(lambda: load_transcription(json_path), repeat=1 if size >= 500000 else 3)
+    results[f"load_transcription/{size}"] = {'seconds': seconds}
+    write_word_index(table, json_path)
+    seconds, _ = timed(lambda: load_word_index(json_path))
+    results[f"load_word_index/{size}"] = {'seconds': seconds}
+    return table
+
+def bench_lookups(table, results, size, count=100000):
+    from display import find_current_word
+
+    times = np.random.default_rng(1).uniform(0, float(table.ends[-1]), size=count)
+    seconds, _ = timed(lambda: [find_current_word(table, t) for t in times.tolist()])
+    results[f"find_current_word/{size}"] = {'seconds_per_lookup': seconds / count}
+    seconds, _ = timed(lambda: table.find_many(times))
+    results[f"find_many/{size}"] = {'seconds_per_lookup': seconds / count}
+
+def bench_tk(table, results, size, highlights=5000):
+    """Time rendering the transcript window and a run of sequential highlight updates."""
+    from tkinter import Tk, Text, TclError
+
+    try:
+        root = Tk()
+    except TclError as e:
+        print(f"Skipping Tk benchmarks ({e}); run under xvfb-run to include them")
+        return
+    try:
+        text_display = Text(root, wrap='word', font=("Helvetica", 16))
+        text_display.pack()
+        view = TranscriptView(text_display, table)
+
+        def render():
+            view.render_around(0)
+            root.update_idletasks()
+        seconds, _ = timed(render)
+        results[f"tk_render/{size}"] = {'seconds': seconds}
+
+        count = min(highlights, len(table))
+        started = time.perf_counter()
+        for i in range(count):
+            view.highlight(i)
+            root.update_idletasks()
+        results[f"tk_highlight/{size}"] = {'seconds_per_update': (time.perf_counter() - started) / count}
+    finally:
+        root.destroy()
+
+def bench_convert(work_dir, results, minutes, workers):
+    if shutil.which("ffmpeg") is None:
+        print("Skipping convert_audio benchmark: ffmpeg not found")
+        return
+    input_folder = os.path.join(work_dir, "input")
+    output_folder = os.path.join(work_dir, "output")
+    os.makedirs(input_folder)
+    os.makedirs(output_folder)
+    books = max(1, workers)
+    for i in range(books):
+        write_tone_wav(os.path.join(input_folder, f"tones{i}.wav"), minutes * 60)
+    started = time.perf_counter()
+    transcribe.convert_audio(input_folder, output_folder, workers=workers)
+    seconds = time.perf_counter() - started
+    audio_seconds = books * minutes * 60
+    results[f"convert_audio/{minutes}min"] = {'seconds': seconds, 'audio_seconds_per_second': audio_seconds / seconds}
+
+def bench_transcribe(work_dir, results, minutes):
+    """Run the windowed transcription path (reading, chunking, merging, saving) with the stub model."""
+    wav_path = os.path.join(work_dir, "stub.wav")
+    write_tone_wav(wav_path, minutes * 60, sample_rate=transcribe.SAMPLE_RATE, channels=1)
+    base_path = os.path.join(work_dir, "stub")
+    with stubbed_whisper():
+        started = time.perf_counter()
+        result = transcribe.transcribe_wav(wav_path, model='stub', checkpoint_dir=f"{base_path}.checkpoint")
+        transcribe.save_transcription(result, f"{base_path}.txt", f"{base_path}.json")
+        transcribe.remove_checkpoint(f"{base_path}.checkpoint")
+        seconds = time.perf_counter() - started
+    results[f"transcribe_stub/{minutes}min"] = {'seconds': seconds, 'rtf': seconds / (minutes * 60)}
+
+def bench_batch_throughput(wav_path, results, model_name, batch_sizes, minutes, threads=None, language='en'):
+    """Transcribe the first minutes of a 16 kHz mono speech WAV at each batch size with a real model."""
+    model = transcribe.load_whisper_model(model_name, threads)
+    if model is None:
+        return
+    limit = int(minutes * 60 * transcribe.SAMPLE_RATE)
+    samples = np.concatenate(list(transcribe.read_wav_blocks(wav_path)))[:limit]
+    audio_seconds = len(samples) / transcribe.SAMPLE_RATE
+    for batch_size in batch_sizes:
+        started = time.perf_counter()
+        result = transcribe.transcribe_samples(model, samples, language, batch_size=batch_size)
+        seconds = time.perf_counter() - started
+        words = sum(len(segment.get('words', [])) for segment in result['segments'])
+        results[f"batch_transcribe/{model_name}/{batch_size}"] = {
+            'seconds': seconds, 'audio_seconds_per_second': audio_seconds / seconds, 'words': words}
+        print(f"  batch size {batch_size}: {audio_seconds / seconds:.2f} audio s/s, {words} words")
+
+def compare(results, baseline_path, threshold=1.2):
+    """Print each metric's ratio to the baseline, flagging those more than threshold times worse."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    print(f"Compared with {baseline_path}:")
+    for name, metrics in results.items():
+        for key, value in metrics.items():
+            old = baseline.get(name, {}).get(key)
+            timing = key.startswith('seconds') or key.endswith('_per_second') or key == 'rtf'
+            if not timing or not old or not value:
+                continue
+            # Throughputs are better when higher, everything else when lower
+            ratio = old / value if key.endswith('_per_second') else value / old
+            flag = "  SLOWER" if ratio > threshold else ""
+            print(f"  {name:<28} {key:<26} {ratio:6.2f}x{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the player and pipeline on synthetic books.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Transcript sizes in words")
+    parser.add_argument('--audio-minutes', type=int, default=10, help="Length of the synthetic audio")
+    parser.add_argument('--workers', type=int, default=1, help="Workers for convert_audio")
+    parser.add_argument('--output', default="benchmark_results.json")
+    parser.add_argument('--baseline', help="Earlier results file to compare with")
+    parser.add_argument('--skip', nargs='*', default=[], choices=['load', 'tk', 'convert', 'transcribe'])
+    parser.add_argument('--compare-batch', metavar='WAV',
+                        help="16 kHz mono speech WAV to compare batch sizes on, with a real model")
+    parser.add_argument('--model', default=transcribe.model_name, help="Model for --compare-batch")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=(1, 4, 8))
+    parser.add_argument('--threads', type=int, default=None, help="Torch threads for --compare-batch")
+    args = parser.parse_args()
+
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="audiblehighlights-bench-")
+    try:
+        for size in args.sizes:
+            print(f"Benchmarking a {size}-word transcript")
+            json_path = os.path.join(work_dir, f"book{size}.json")
+            transcribe.write_json_atomic(synthetic_result(size), json_path, indent=None)
+            if 'load' not in args.skip:
+                table = bench_loading(json_path, results, size)
+                bench_lookups(table, results, size)
+                if 'tk' not in args.skip:
+                    bench_tk(table, results, size)
+        if 'convert' not in args.skip:
+            print(f"Benchmarking convert_audio on {args.audio_minutes} min of audio")
+            bench_convert(os.path.join(work_dir, "convert"), results, args.audio_minutes, args.workers)
+        if 'transcribe' not in args.skip:
+            print(f"Benchmarking transcription with a stubbed model on {args.audio_minutes} min of audio")
+            bench_transcribe(work_dir, results, args.audio_minutes)
+        if args.compare_batch:
+            print(f"Comparing batch sizes {args.batch_sizes} with the {args.model} model")
+            bench_batch_throughput(args.compare_batch, results, args.model, args.batch_sizes,
+                                   args.audio_minutes, args.threads)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'numpy': np.__version__, 'cpus': os.cpu_count()},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    for name, metrics in results.items():
+        print(f"{name:<28} " + "  ".join(f"{key}={value:.6g}" for key, value in metrics.items()))
+    print(f"Results written: {args.output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Books made of several audio files, played and searched as one timeline.
+
+A folder in the input folder is one book whose parts are its audio files,
+in natural order ("Part 2" before "Part 10"). Each part is converted and
+transcribed on its own into output/<book>/parts/, and an offset index,
+output/<book>/<book>.parts.json, records where each part starts on the
+book's timeline:
+
+    {"book": "YourBook3", "duration": 5400.0, "parts": [
+        {"name": "01 Opening", "source": ".../input/YourBook3/01 Opening.mp3",
+         "wav": "parts/01 Opening.wav", "offset": 0.0, "duration": 1800.0}, ...]}
+
+The parts' words are shifted by these offsets into one <book>.json, so the
+rest of the project sees an ordinary book; only playback needs the index to
+move between the part files.
+"""
+import bisect
+import json
+import os
+import re
+
+from common import write_json_atomic
+
+PARTS_SUFFIX = ".parts.json"
+PARTS_FOLDER = "parts"
+
+def natural_key(name):
+    """Sort key that orders the numbers in a name by value, e.g. "Part 2" before "Part 10"."""
+    return [int(piece) if piece.isdigit() else piece.lower() for piece in re.split(r'(\d+)', name)]
+
+def list_parts(book_folder, extensions):
+    """Return the audio files directly inside book_folder with one of extensions, in natural order."""
+    names = [name for name in os.listdir(book_folder)
+             if os.path.isfile(os.path.join(book_folder, name)) and os.path.splitext(name)[1].lower() in extensions]
+    return sorted(names, key=natural_key)
+
+def parts_index_path(book_output_dir):
+    return os.path.join(book_output_dir, os.path.basename(os.path.normpath(book_output_dir)) + PARTS_SUFFIX)
+
+def build_parts_index(book, parts):
+    """Index of parts given as (name, source_path, wav_path relative to the book folder, duration) in order."""
+    entries, offset = [], 0.0
+    for name, source, wav, duration in parts:
+        entries.append({'name': name, 'source': source, 'wav': wav, 'offset': round(offset, 3),
+                        'duration': round(duration, 3)})
+        offset += duration
+    return {'book': book, 'duration': round(offset, 3), 'parts': entries}
+
+def write_parts_index(index, path):
+    write_json_atomic(index, path)
+
+def load_parts_index(path):
+    """Return the parts index at path, or None if it is missing or unreadable."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def locate(index, seconds):
+    """Return (part number, seconds into that part) for a time on the book's timeline."""
+    offsets = [part['offset'] for part in index['parts']]
+    number = max(0, bisect.bisect_right(offsets, seconds) - 1)
+    return number, max(0.0, seconds - offsets[number])
+
+def parts_as_chapters(index):
+    """The parts as chapters for the player, when the files carry no chapter list of their own."""
+    return [{'title': part['name'], 'start_time': part['offset']} for part in index['parts']]
@@ -0,0 +1,95 @@
+"""Confidence cascade: re-transcribe only the weak passages with a larger model.
+
+A book is first transcribed with a small, fast model. Each segment's
+confidence (the mean of its word confidences, as whisper_timestamped reports
+them) is then checked, runs of consecutive segments below the threshold are
+transcribed again with a larger model, and the new words replace the old
+ones. Most of a book thus costs small-model time while passages the small
+model struggled with (names, accents, noise) get large-model quality.
+
+Each weak run is decoded with a little audio of context on both sides, so
+words cut at its edges are still recognised. Only the new words that fall
+inside the run are kept, and their times are clamped between the kept
+neighbouring segments, so the timeline stays ordered.
+"""
+CONFIDENCE_THRESHOLD = 0.6  # Segments with a lower mean word confidence are re-transcribed
+CONTEXT_SECONDS = 1.0  # Audio decoded on each side of a weak run
+
+def segment_confidence(segment):
+    """Mean word confidence of a segment (its own confidence when it has no words)."""
+    words = [word for word in segment.get('words', []) if 'confidence' in word]
+    if words:
+        return sum(word['confidence'] for word in words) / len(words)
+    return segment.get('confidence', 1.0)
+
+def weak_runs(segments, threshold=CONFIDENCE_THRESHOLD):
+    """Return (first, last) segment indices of each run of consecutive segments below threshold."""
+    runs = []
+    for index, segment in enumerate(segments):
+        if segment_confidence(segment) >= threshold:
+            continue
+        if runs and runs[-1][1] == index - 1:
+            runs[-1] = (runs[-1][0], index)
+        else:
+            runs.append((index, index))
+    return runs
+
+def _splice_segments(refined, start, end, floor, ceiling, model_name):
+    """Segments of a refined result restricted to [start, end], with times clamped to [floor, ceiling]."""
+    segments = []
+    for segment in refined.get('segments', []):
+        words = []
+        for word in segment.get('words', []):
+            middle = (word['start'] + word['end']) / 2
+            if not start <= middle <= end:
+                continue
+            word = dict(word)
+            word['start'] = round(min(max(word['start'], floor), ceiling), 2)
+            word['end'] = round(min(max(word['end'], word['start']), ceiling), 2)
+            words.append(word)
+        if not words:
+            continue
+        segment = dict(segment, words=words, start=words[0]['start'], end=words[-1]['end'],
+                       text=' ' + ' '.join(word['text'] for word in words), refined_by=model_name)
+        segment['confidence'] = round(segment_confidence(segment), 3)
+        segments.append(segment)
+    return segments
+
+def refine_result(result, transcribe_span, model_name, threshold=CONFIDENCE_THRESHOLD,
+                  context_seconds=CONTEXT_SECONDS, duration=None):
+    """Re-transcribe the weak segment runs of result and splice the new words in.
+
+    transcribe_span(start, end) must return a whisper result for that part of
+    the audio (in seconds) on the book's timeline. Returns the refined result
+    and the number of seconds of audio that were transcribed again.
+    """
+    segments = result.get('segments', [])
+    refined_segments = []
+    refined_seconds = 0.0
+    position = 0
+    for first, last in weak_runs(segments, threshold):
+        start, end = segments[first]['start'], segments[last]['end']
+        floor = segments[first - 1]['end'] if first > 0 else 0.0
+        ceiling = segments[last + 1]['start'] if last + 1 < len(segments) else end + context_seconds
+        span_start = max(0.0, start - context_seconds)
+        span_end = end + context_seconds if duration is None else min(duration, end + context_seconds)
+        try:
+            refined = transcribe_span(span_start, span_end)
+        except Exception as e:
+            print(f"Error re-transcribing {start:.2f}-{end:.2f}s, keeping the original words: {e}")
+            continue
+        refined_seconds += span_end - span_start
+        replacement = _splice_segments(refined, start, end, floor, ceiling, model_name)
+        if not replacement:
+            # The larger model heard nothing there; the original words are the better guess
+            continue
+        refined_segments.extend(segments[position:first])
+        refined_segments.extend(replacement)
+        position = last + 1
+    refined_segments.extend(segments[position:])
+
+    for index, segment in enumerate(refined_segments):
+        segment['id'] = index
+    refined_result = dict(result, segments=refined_segments,
+                          text=''.join(segment['text'] for segment in refined_segments))
+    return refined_result, refined_seconds
@@ -0,0 +1,317 @@
+"""SQLite catalog and full-text index of every transcript in the output folder.
+
+Each `output/<book>/<book>.json` written by transcribe.py is loaded into one
+database (output/catalog.sqlite3) with its chapters, its words and their
+timestamps, and an FTS5 index of its segments. A book is only re-indexed when
+its JSON changed since the last run, and books whose JSON disappeared are
+dropped.
+
+Usage:
+    python catalog.py index               # add new and changed books
+    python catalog.py search "query"      # search every book
+    python catalog.py search "philos*"    # a trailing * matches word prefixes
+
+Each search hit prints the command that opens the player at that word.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+from book_parts import PARTS_SUFFIX, load_parts_index, parts_index_path
+from search_index import normalize, parse_query
+from word_table import WordTable, iter_words
+
+CATALOG_FILENAME = "catalog.sqlite3"
+AUDIO_EXTENSIONS = (".m4b", ".m4a", ".mp4", ".mp3", ".aac", ".ogg", ".flac", ".wav", ".wma", ".webm")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    json_path TEXT NOT NULL,
+    audio_path TEXT,
+    json_size INTEGER NOT NULL,
+    json_mtime_ns INTEGER NOT NULL,
+    word_count INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chapters (
+    book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    title TEXT,
+    start_time REAL NOT NULL,
+    PRIMARY KEY (book_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS segments (
+    book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    first_word INTEGER NOT NULL,
+    word_count INTEGER NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    PRIMARY KEY (book_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS words (
+    book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    word TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    PRIMARY KEY (book_id, position)
+) WITHOUT ROWID;
+-- rowid = book id << 32 | segment position, so a book's rows can be deleted by range;
+-- text holds the segment's words normalised as in the player's search (search_index.normalize)
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+# Bumped when the indexed text changes; older catalogs are re-indexed by the next `index` run
+CATALOG_VERSION = 1
+
+def catalog_path(output_folder):
+    return os.path.join(output_folder, CATALOG_FILENAME)
+
+def connect(db_path):
+    """Open the catalog, creating its tables if needed."""
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.executescript(SCHEMA)
+    if connection.execute("PRAGMA user_version").fetchone()[0] < CATALOG_VERSION:
+        with connection:
+            # Forget the indexed sizes so every book is indexed again
+            connection.execute("DELETE FROM segments_fts")
+            connection.execute("UPDATE books SET json_size = -1")
+            connection.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+    return connection
+
+def _fts_rowid(book_id, position):
+    return (book_id << 32) | position
+
+def find_audio_file(input_folder, name):
+    """Return the audio file in input_folder that a book was transcribed from, if it is still there."""
+    for ext in AUDIO_EXTENSIONS:
+        path = os.path.join(input_folder, name + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+def read_chapters(audio_path):
+    """Return [(title, start_time)] from an MP4/M4B file's chapter list, if any.
+
+    For a book made of several files (audio_path is its parts index), the parts are the chapters.
+    """
+    if audio_path and audio_path.endswith(PARTS_SUFFIX):
+        index = load_parts_index(audio_path)
+        return [(part['name'], part['offset']) for part in index['parts']] if index else []
+    if not audio_path or os.path.splitext(audio_path)[1].lower() not in (".m4b", ".m4a", ".mp4"):
+        return []
+    try:
+        from mutagen.mp4 import MP4
+        return [(chapter.title, chapter.start) for chapter in (MP4(audio_path).chapters or [])]
+    except Exception as e:
+        print(f"Error extracting chapters from {audio_path}: {e}")
+        return []
+
+def _delete_book_rows(connection, book_id):
+    connection.execute("DELETE FROM segments_fts WHERE rowid BETWEEN ? AND ?",
+                       (_fts_rowid(book_id, 0), _fts_rowid(book_id, 0xFFFFFFFF)))
+    for table in ("chapters", "segments", "words"):
+        connection.execute(f"DELETE FROM {table} WHERE book_id = ?", (book_id,))
+
+def index_book(connection, name, json_path, audio_path):
+    """(Re)load one transcript into the catalog, replacing whatever it held for the book."""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    stat = os.stat(json_path)
+    words = list(iter_words(data))
+
+    with connection:
+        row = connection.execute("SELECT id FROM books WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            book_id = connection.execute(
+                "INSERT INTO books (name, json_path, json_size, json_mtime_ns, word_count, duration, indexed_at)"
+                " VALUES (?, ?, 0, 0, 0, 0, 0)", (name, json_path)).lastrowid
+        else:
+            book_id = row[0]
+            _delete_book_rows(connection, book_id)
+
+        connection.executemany(
+            "INSERT INTO words (book_id, position, word, start_time, end_time) VALUES (?, ?, ?, ?, ?)",
+            ((book_id, position, text, start, end) for position, (text, start, end) in enumerate(words)))
+
+        first_word = 0
+        segment_rows = []
+        fts_rows = []
+        for position, segment in enumerate(data.get('segments', [])):
+            segment_words = [word.get('text', '').strip() for word in segment.get('words', [])]
+            segment_rows.append((book_id, position, first_word, len(segment_words),
+                                 float(segment.get('start', 0)), float(segment.get('end', 0))))
+            fts_rows.append((_fts_rowid(book_id, position), ' '.join(normalize(word) for word in segment_words)))
+            first_word += len(segment_words)
+        connection.executemany(
+            "INSERT INTO segments (book_id, position, first_word, word_count, start_time, end_time)"
+            " VALUES (?, ?, ?, ?, ?, ?)", segment_rows)
+        connection.executemany("INSERT INTO segments_fts (rowid, text) VALUES (?, ?)", fts_rows)
+
+        connection.executemany(
+            "INSERT INTO chapters (book_id, position, title, start_time) VALUES (?, ?, ?, ?)",
+            ((book_id, position, title, start) for position, (title, start) in enumerate(read_chapters(audio_path))))
+
+        connection.execute(
+            "UPDATE books SET json_path = ?, audio_path = ?, json_size = ?, json_mtime_ns = ?,"
+            " word_count = ?, duration = ?, indexed_at = ? WHERE id = ?",
+            (json_path, audio_path, stat.st_size, stat.st_mtime_ns, len(words),
+             words[-1][2] if words else 0.0, time.time(), book_id))
+    return book_id
+
+def index_library(output_folder, input_folder, db_path=None):
+    """Bring the catalog up to date with the transcripts in output_folder."""
+    connection = connect(db_path or catalog_path(output_folder))
+    known = {name: (size, mtime_ns) for name, size, mtime_ns in
+             connection.execute("SELECT name, json_size, json_mtime_ns FROM books")}
+
+    try:
+        subdirectories = sorted(d for d in os.listdir(output_folder) if os.path.isdir(os.path.join(output_folder, d)))
+    except Exception as e:
+        print(f"Error accessing output folder: {e}")
+        return
+
+    present = set()
+    for name in subdirectories:
+        json_path = os.path.join(output_folder, name, f"{name}.json")
+        if not os.path.exists(json_path):
+            continue
+        present.add(name)
+        stat = os.stat(json_path)
+        if known.get(name) == (stat.st_size, stat.st_mtime_ns):
+            continue
+        try:
+            started = time.perf_counter()
+            audio_path = find_audio_file(input_folder, name)
+            if audio_path is None and os.path.exists(parts_index_path(os.path.join(output_folder, name))):
+                # Played from its part files
+                audio_path = os.path.abspath(parts_index_path(os.path.join(output_folder, name)))
+            index_book(connection, name, json_path, audio_path)
+            print(f"Indexed {name} in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            print(f"Error indexing {json_path}: {e}")
+
+    for name in set(known) - present:
+        with connection:
+            book_id = connection.execute("SELECT id FROM books WHERE name = ?", (name,)).fetchone()[0]
+            _delete_book_rows(connection, book_id)
+            connection.execute("DELETE FROM books WHERE id = ?", (book_id,))
+        print(f"Removed {name} from the catalog")
+    connection.close()
+
+def _fts_query(terms):
+    """Turn parsed query terms into an FTS5 phrase; only the last term can be a prefix."""
+    phrase = '"' + ' '.join(term for term, _ in terms) + '"'
+    return phrase + ' *' if terms[-1][1] else phrase
+
+def _match_in_segment(words, terms):
+    """Return the offsets of the words matching terms, first run only, or [] if none do."""
+    # Words that are only punctuation are not in the index, so the phrase runs across them
+    tokens, owners = [], []
+    for index, word in enumerate(words):
+        token = normalize(word)
+        if token:
+            tokens.append(token)
+            owners.append(index)
+    for offset in range(len(tokens) - len(terms) + 1):
+        if all(tokens[offset + k] == term or (is_prefix and tokens[offset + k].startswith(term))
+               for k, (term, is_prefix) in enumerate(terms)):
+            return owners[offset:offset + len(terms)]
+    return []
+
+def _snippet(words, matched, before=6, after=10):
+    """The words around a match, with the matching words in brackets."""
+    first, last = matched[0] if matched else 0, matched[-1] if matched else 0
+    shown = [f"[{word}]" if index in matched else word
+             for index, word in enumerate(words[max(0, first - before):last + after + 1], start=max(0, first - before))]
+    return ('...' if first > before else '') + ' '.join(shown) + ('...' if last + after + 1 < len(words) else '')
+
+def search(db_path, query, limit=50):
+    """Search every book; returns dicts with the book, the matching word and its time."""
+    terms = parse_query(query)
+    if not terms:
+        return []
+    connection = connect(db_path)
+    hits = []
+    rows = connection.execute(
+        "SELECT rowid FROM segments_fts"
+        " WHERE segments_fts MATCH ? ORDER BY rank LIMIT ?", (_fts_query(terms), limit)).fetchall()
+    for rowid, in rows:
+        book_id, position = rowid >> 32, rowid & 0xFFFFFFFF
+        name, json_path, audio_path = connection.execute(
+            "SELECT name, json_path, audio_path FROM books WHERE id = ?", (book_id,)).fetchone()
+        first_word, word_count = connection.execute(
+            "SELECT first_word, word_count FROM segments WHERE book_id = ? AND position = ?",
+            (book_id, position)).fetchone()
+        words = connection.execute(
+            "SELECT word, start_time FROM words WHERE book_id = ? AND position >= ? AND position < ?"
+            " ORDER BY position", (book_id, first_word, first_word + word_count)).fetchall()
+        matched = _match_in_segment([word for word, _ in words], terms)
+        offset = matched[0] if matched else 0
+        hits.append({
+            'book': name,
+            'json_path': json_path,
+            'audio_path': audio_path,
+            'word_index': first_word + offset,
+            'start_time': words[offset][1] if words else 0.0,
+            'snippet': _snippet([word for word, _ in words], matched),
+        })
+    connection.close()
+    return hits
+
+def find_book(db_path, name):
+    """Return (json_path, audio_path) of a catalogued book, or None."""
+    connection = connect(db_path)
+    row = connection.execute("SELECT json_path, audio_path FROM books WHERE name = ?", (name,)).fetchone()
+    connection.close()
+    return row
+
+def load_book_words(db_path, name):
+    """Load a book's words from the catalog as a WordTable, without touching its JSON."""
+    connection = connect(db_path)
+    rows = connection.execute(
+        "SELECT word, start_time, end_time FROM words JOIN books ON books.id = words.book_id"
+        " WHERE books.name = ? ORDER BY position", (name,)).fetchall()
+    connection.close()
+    return WordTable.from_words(rows) if rows else None
+
+def load_book_chapters(db_path, name):
+    """Load a book's chapters from the catalog, in the format of display.extract_chapters."""
+    connection = connect(db_path)
+    rows = connection.execute(
+        "SELECT title, start_time FROM chapters JOIN books ON books.id = chapters.book_id"
+        " WHERE books.name = ? ORDER BY position", (name,)).fetchall()
+    connection.close()
+    return [{'title': title, 'start_time': start_time} for title, start_time in rows]
+
+def main():
+    import transcribe
+
+    parser = argparse.ArgumentParser(description="Catalog and search every transcribed book.")
+    parser.add_argument('command', choices=['index', 'search'])
+    parser.add_argument('query', nargs='?', default='')
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    input_folder, output_folder = transcribe.setup_project_folders(transcribe.project_folder)
+    db_path = catalog_path(output_folder)
+    if args.command == 'index':
+        index_library(output_folder, input_folder, db_path)
+        return
+
+    for hit in search(db_path, args.query, args.limit):
+        start_time_formatted = time.strftime('%H:%M:%S', time.gmtime(hit['start_time']))
+        print(f"{hit['book']}  {start_time_formatted}  {hit['snippet']}")
+        print(f"    python display.py --book \"{hit['book']}\" --at {hit['start_time']:.2f}")
+
+if __name__ == "__main__":
+    main()
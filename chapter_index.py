@@ -0,0 +1,107 @@
+"""Chapters of a transcript as ranges of words, with per-chapter data built on demand.
+
+The player works on one chapter at a time: only the active chapter's words
+are ever rendered, and until the book-wide search index is ready, search
+runs over an index of the active chapter alone. A ChapterIndex maps the
+chapters' start times to word ranges once, with one binary search over the
+word start times, so finding the chapter of a word or a time is a lookup in
+an array of chapter starts.
+
+A ChapterCache builds a chapter's own WordTable and SearchIndex the first
+time they are needed, and can prefetch them on a background thread (the next
+chapter, typically), so switching to it later is instant. Only the few most
+recently used chapters are kept.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from search_index import SearchIndex
+
+KEEP_CHAPTERS = 4  # Chapters whose tables and search indexes are kept in memory
+
+class ChapterIndex:
+    """Word range of each chapter of a WordTable, from the chapters' start times.
+
+    Chapter n covers words firsts[n]..firsts[n + 1] - 1: the words that start
+    at or after its start time and before the next chapter's. Words before the
+    first chapter belong to it. Without chapters the whole book is one chapter.
+    Chapters are numbered in the order given, like the player's chapter list;
+    one starting before its predecessor is left empty.
+    """
+
+    def __init__(self, word_data, chapters=None):
+        self.word_count = len(word_data)
+        start_times = [float(chapter['start_time']) for chapter in chapters or []]
+        if start_times:
+            firsts = np.maximum.accumulate(word_data.first_starting_at(start_times))
+            firsts[0] = 0
+        else:
+            firsts = np.zeros(1, dtype=np.int64)
+        self.firsts = firsts.astype(np.int64)
+
+    def __len__(self):
+        return len(self.firsts)
+
+    def word_range(self, chapter):
+        """Return (first word, one past the last word) of chapter."""
+        last = int(self.firsts[chapter + 1]) if chapter + 1 < len(self.firsts) else self.word_count
+        return int(self.firsts[chapter]), last
+
+    def chapter_of(self, word_index):
+        """Return the chapter containing word index (chapter 0 for -1, before the first word)."""
+        return max(0, int(np.searchsorted(self.firsts, word_index, side='right')) - 1)
+
+class ChapterData:
+    """A chapter's words as a WordTable of their own, with its search index.
+
+    Word i of the table is word first + i of the book.
+    """
+
+    def __init__(self, chapter, first, last, words):
+        self.chapter = chapter
+        self.first = first
+        self.last = last
+        self.words = words
+        self.search_index = SearchIndex(words)
+        self.search_index.build()
+
+    def search(self, query, limit=200):
+        """Search the chapter; returns book word indices."""
+        return [self.first + index for index in self.search_index.search(query, limit)]
+
+class ChapterCache:
+    """ChapterData of recently used chapters, built when first needed or prefetched in the background."""
+
+    def __init__(self, word_data, chapter_index, keep=KEEP_CHAPTERS):
+        self.word_data = word_data
+        self.chapter_index = chapter_index
+        self.keep = keep
+        self._chapters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chapter):
+        """Return the ChapterData of chapter, building it now if it is not cached."""
+        with self._lock:
+            if chapter in self._chapters:
+                self._chapters.move_to_end(chapter)
+                return self._chapters[chapter]
+        # Built outside the lock so a prefetch does not hold up the chapter being shown
+        first, last = self.chapter_index.word_range(chapter)
+        data = ChapterData(chapter, first, last, self.word_data.slice(first, last))
+        with self._lock:
+            data = self._chapters.setdefault(chapter, data)
+            self._chapters.move_to_end(chapter)
+            while len(self._chapters) > self.keep:
+                self._chapters.popitem(last=False)
+        return data
+
+    def prefetch(self, chapter):
+        """Build chapter on a daemon thread unless it is cached or does not exist."""
+        if not 0 <= chapter < len(self.chapter_index):
+            return
+        with self._lock:
+            if chapter in self._chapters:
+                return
+        threading.Thread(target=self.get, args=(chapter,), name=f"chapter-{chapter}", daemon=True).start()
@@ -0,0 +1,25 @@
+"""Constants and file helpers shared by the transcription and player modules."""
+import json
+import os
+from contextlib import contextmanager
+
+SAMPLE_RATE = 16000  # Whisper's input rate; every WAV and sample array in the project uses it
+# whisper results measure a segment's 'seek' in 10 ms mel frames
+SEEK_FRAMES_PER_SECOND = 100
+
+@contextmanager
+def atomic_open(path, mode='w', opener=open, **kwargs):
+    """Open a temporary file that replaces path once the with block completes.
+
+    Readers never see a partial file; if the block raises, path is left as it was.
+    opener can be e.g. gzip.open; kwargs are passed on to it.
+    """
+    partial_path = f"{path}.part"
+    with opener(partial_path, mode, **kwargs) as f:
+        yield f
+    os.replace(partial_path, path)
+
+def write_json_atomic(data, path, indent=2):
+    """Write JSON to path through a temporary file, so readers never see a partial file."""
+    with atomic_open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
@@ -1,4 +1,6 @@
+import argparse
 import json
+import os
 import time
 from tkinter import *
 from tkinter.colorchooser import askcolor
@@ -6,68 +8,78 @@ from tkinter import ttk  # For Treeview
 import vlc
 import threading
 from mutagen.mp4 import MP4
+from transcript_index import load_word_index, write_word_index
+from word_table import WordTable
+from transcript_view import TranscriptView
+from search_index import SearchIndex
+from chapter_index import ChapterCache, ChapterIndex
+from media_info import BackgroundTask, load_media_info, save_media_info
+from sync_telemetry import SyncTelemetry
+from catalog import CATALOG_FILENAME, find_book, load_book_chapters, load_book_words
+from book_parts import PARTS_SUFFIX, load_parts_index, locate, parts_as_chapters
 
 # Global variables
 delay = 200  # Default delay in milliseconds
 highlight_color = 'cyan'
 audio_duration = 0
 player = None
-update_interval = 20  # Update interval in milliseconds
+update_interval = 250  # Longest wait between updates in milliseconds; highlights are scheduled at word boundaries in between
+resync_interval = 500  # How often the interpolated position is checked against VLC while playing, in milliseconds
 playback_speed = 1.0  # Default playback speed
 is_slider_being_dragged = False  # Flag to track slider interaction
+playback_clock = None
+wake_sync = None  # Runs the sync update right away, e.g. after a seek
+sync_telemetry = None  # SyncTelemetry when started with --telemetry
+telemetry_path = "display_telemetry.json"  # Where the telemetry is written on exit
 
 # Declare global widgets that need to be accessed outside create_display
 timeline_slider = None
 status_label = None
 
 def load_transcription(json_file_path):
-    """Load and parse the JSON file with word-level timestamps, precomputing character indices."""
+    """Load and parse the JSON file with word-level timestamps into a WordTable."""
     try:
         with open(json_file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
     except Exception as e:
         print(f"Error loading JSON file: {e}")
-        return []
+        return None
+
+    words = WordTable.from_result(data)
+
+    # Detect gaps or overlaps
+    if len(words) > 1:
+        gaps = int((words.starts[1:] > words.ends[:-1]).sum())
+        overlaps = int((words.starts[1:] < words.ends[:-1]).sum())
+        print(f"Loaded {len(words)} words: {gaps} gaps and {overlaps} overlaps between words")
+    return words
 
-    words = []
-    total_chars = 0  # Initialize character count
-    previous_end_time = 0
-    for segment in data.get('segments', []):
-        for word_info in segment.get('words', []):
-            word_text = word_info.get('text', '').strip()
-            start_time = float(word_info.get('start', 0))
-            end_time = float(word_info.get('end', 0))
-
-            # Detect gaps or overlaps
-            if start_time > previous_end_time:
-                print(f"Gap detected between {previous_end_time}s and {start_time}s")
-            elif start_time < previous_end_time:
-                print(f"Overlap detected at {start_time}s")
-
-            words.append({
-                'word': word_text,
-                'start_time': start_time,
-                'end_time': end_time,
-                'char_index_start': total_chars,
-                'char_index_end': total_chars + len(word_text)
-            })
-            total_chars += len(word_text) + 1  # +1 for the space
-            previous_end_time = end_time
+def load_word_data(json_file_path):
+    """Load word data from the memory-mapped word index, falling back to the JSON file.
+
+    When the index is missing or older than the JSON, the JSON is parsed and the
+    index is rebuilt, so the next start is fast.
+    """
+    word_index = load_word_index(json_file_path)
+    if word_index is not None:
+        return word_index
+
+    words = load_transcription(json_file_path)
+    if words:
+        try:
+            write_word_index(words, json_file_path)
+        except Exception as e:
+            print(f"Error writing word index: {e}")
     return words
 
 def find_current_word(word_data, current_time):
-    """Find the word that corresponds to the current time using binary search."""
-    left, right = 0, len(word_data) - 1
-    while left <= right:
-        mid = (left + right) // 2
-        word = word_data[mid]
-        if word['start_time'] <= current_time <= word['end_time']:
-            return word
-        elif current_time < word['start_time']:
-            right = mid - 1
-        else:
-            left = mid + 1
-    return None
+    """Return the index of the word to highlight at current_time, or None before the first word.
+
+    In the gap between two words this is the word just spoken, so the highlight
+    stays on it until the next word starts (see WordTable.find).
+    """
+    index = word_data.find(current_time)
+    return index if index >= 0 else None
 
 def extract_chapters(m4b_file_path):
     """Extract chapters from an M4B file using Mutagen."""
@@ -86,56 +98,259 @@ def extract_chapters(m4b_file_path):
         print(f"Error extracting chapters: {e}")
         return []
 
-def sync_audio_and_text(root, word_data, text_display, delay_slider, timeline_slider, current_time_label, total_time_label):
-    """Synchronize audio playback with text highlighting."""
+class PartsPlayer:
+    """Plays the part files of a multi-file book (see book_parts.py) back to back as one timeline.
+
+    Wraps a VLC media list player and offers the MediaPlayer calls the display
+    uses, with times in milliseconds on the book's timeline. Seeking into
+    another part starts that part, and the position within it is applied once
+    VLC reports it as playing (VLC ignores set_time before that).
+    """
+
+    def __init__(self, instance, parts_index, start_time=None):
+        self.index = parts_index
+        self.media_list = instance.media_list_new([part['source'] for part in parts_index['parts']])
+        self.player = instance.media_player_new()
+        self.list_player = instance.media_list_player_new()
+        self.list_player.set_media_player(self.player)
+        self.list_player.set_media_list(self.media_list)
+        self.part = 0
+        self.pending_ms = None  # Position waiting for its part to start playing
+        self.pause_when_started = False
+        if start_time:
+            self.pending_ms = int(start_time * 1000)
+
+    def current_part(self):
+        media = self.player.get_media()
+        if media is not None:
+            number = self.media_list.index_of_item(media)
+            if number >= 0:
+                self.part = number
+        return self.part
+
+    def _apply_pending(self):
+        if self.pending_ms is None or not self.player.is_playing():
+            return
+        number, local_seconds = locate(self.index, self.pending_ms / 1000.0)
+        if self.current_part() != number:
+            return
+        self.player.set_time(int(local_seconds * 1000))
+        self.pending_ms = None
+        if self.pause_when_started:
+            self.pause_when_started = False
+            self.list_player.pause()
+
+    def get_time(self):
+        self._apply_pending()
+        if self.pending_ms is not None:
+            return self.pending_ms
+        offset_ms = int(self.index['parts'][self.current_part()]['offset'] * 1000)
+        return offset_ms + max(self.player.get_time(), 0)
+
+    def set_time(self, position_ms):
+        number, local_seconds = locate(self.index, position_ms / 1000.0)
+        state = self.player.get_state()
+        if number == self.current_part() and state in (vlc.State.Playing, vlc.State.Paused):
+            self.player.set_time(int(local_seconds * 1000))
+            return
+        self.pending_ms = position_ms
+        if state in (vlc.State.Playing, vlc.State.Paused):
+            self.pause_when_started = state == vlc.State.Paused
+            self.part = number
+            self.list_player.play_item_at_index(number)
+
+    def get_length(self):
+        return int(self.index['duration'] * 1000)
+
+    def play(self):
+        if self.pending_ms is not None and self.player.get_state() != vlc.State.Paused:
+            self.part = locate(self.index, self.pending_ms / 1000.0)[0]
+            self.list_player.play_item_at_index(self.part)
+        else:
+            self.list_player.play()
+
+    def pause(self):
+        self.list_player.pause()
+
+    def stop(self):
+        self.list_player.stop()
+        self.part = 0
+
+    def is_playing(self):
+        self._apply_pending()
+        return self.player.is_playing()
+
+    def get_state(self):
+        return self.player.get_state()
+
+    def get_rate(self):
+        return self.player.get_rate()
+
+    def set_rate(self, rate):
+        return self.player.set_rate(rate)
+
+class PlaybackClock:
+    """Estimates the playback position from a monotonic clock and the playback rate.
+
+    VLC is only asked for its time every resync_interval while playing, since
+    get_time() advances in coarse steps. Small differences are blended in
+    gradually so the highlight does not jitter; large ones (seeks) are taken over.
+    """
+    SNAP_MS = 400  # Differences above this are treated as a jump in position
+    CORRECTION = 0.25  # Share of a small difference corrected at each resync
+
+    def __init__(self, player):
+        self.player = player
+        self.active = False  # Playing or paused
+        self.playing = False
+        self.rate = 1.0
+        self.anchor_ms = 0.0
+        self.anchor_clock = time.monotonic()
+        self.last_reported_ms = None
+        self.last_sync = None
+
+    def position_ms(self):
+        """Return the estimated playback position in milliseconds."""
+        if not self.playing:
+            return self.anchor_ms
+        return self.anchor_ms + (time.monotonic() - self.anchor_clock) * 1000.0 * self.rate
+
+    def _set_anchor(self, position_ms):
+        self.anchor_ms = position_ms
+        self.anchor_clock = time.monotonic()
+
+    def sync(self, force=False):
+        """Re-read VLC's state and time, at most every resync_interval while playing unless forced."""
+        now = time.monotonic()
+        if (not force and self.playing and self.last_sync is not None
+                and now - self.last_sync < resync_interval / 1000.0):
+            return
+        self.last_sync = now
+
+        playing = bool(self.player.is_playing())
+        active = playing or self.player.get_state() == vlc.State.Paused
+        rate = self.player.get_rate() or 1.0
+        reported_ms = max(self.player.get_time(), 0)
+
+        if force or not playing or not self.playing or rate != self.rate:
+            # Start interpolating from VLC's position
+            self._set_anchor(reported_ms)
+        elif reported_ms != self.last_reported_ms:
+            error = reported_ms - self.position_ms()
+            if abs(error) > self.SNAP_MS:
+                self._set_anchor(reported_ms)
+            else:
+                self._set_anchor(self.position_ms() + error * self.CORRECTION)
+        self.playing, self.active, self.rate = playing, active, rate
+        self.last_reported_ms = reported_ms
+
+    def jump_to(self, position_ms):
+        """Take over a position just given to VLC, before VLC itself reports it."""
+        self._set_anchor(position_ms)
+        self.last_sync = time.monotonic()
+        # VLC keeps reporting the old time for a moment; don't mistake it for a new reading
+        self.last_reported_ms = max(self.player.get_time(), 0)
+
+def notify_playback_changed(position_ms=None):
+    """Tell the sync loop that playback was started, paused, sought or changed speed."""
+    if playback_clock is None:
+        return
+    if position_ms is not None:
+        playback_clock.jump_to(position_ms)
+    else:
+        playback_clock.sync(force=True)
+    if wake_sync is not None:
+        wake_sync()
+
+def sync_audio_and_text(root, word_data, transcript_view, delay_slider, timeline_slider, current_time_label, total_time_label):
+    """Synchronize audio playback with text highlighting.
+
+    Instead of polling VLC at a fixed rate, the position is interpolated by a
+    PlaybackClock and the next update is scheduled for the moment the current
+    word changes, waiting at most update_interval (for the slider and labels).
+    Returns a function that runs the update right away.
+    """
     current_word = None  # Track the currently highlighted word
+    pending_update = None  # Tk id of the scheduled update
+    last_labels_update = 0.0
 
     def update():
-        nonlocal current_word
+        nonlocal current_word, pending_update, last_labels_update
+        pending_update = None
+        wait_ms = update_interval
+        tick_started = time.perf_counter()
         try:
-            if player is not None and (player.is_playing() or player.get_state() == vlc.State.Paused):
+            if player is not None:
+                playback_clock.sync()
+            if player is not None and playback_clock.active:
                 # Get current playback time in milliseconds
-                current_time_ms = player.get_time()
-                if current_time_ms == -1:
-                    current_time_ms = 0
+                current_time_ms = int(playback_clock.position_ms())
                 current_time = current_time_ms / 1000.0 + delay / 1000.0
 
                 # Find the current word using binary search
-                word_info = find_current_word(word_data, current_time)
-                if word_info and word_info != current_word:
-                    current_word = word_info
-                    text_display.config(state=NORMAL)
-                    text_display.tag_remove('highlight', '1.0', 'end')
-                    word_start_idx = f"1.0 + {word_info['char_index_start']} chars"
-                    word_end_idx = f"1.0 + {word_info['char_index_end']} chars"
-                    text_display.tag_add('highlight', word_start_idx, word_end_idx)
-                    text_display.tag_config('highlight', background=highlight_color)
-                    text_display.see(word_start_idx)
-                    text_display.config(state=DISABLED)
-                elif not word_info and current_word is not None:
-                    text_display.config(state=NORMAL)
-                    text_display.tag_remove('highlight', '1.0', 'end')
+                word_index = find_current_word(word_data, current_time)
+                if word_index is not None and word_index != current_word:
+                    # Only the previous and the new word are touched, and the window
+                    # slides along with playback
+                    advanced = current_word is not None and word_index == current_word + 1
+                    current_word = word_index
+                    highlight_started = time.perf_counter()
+                    transcript_view.highlight(word_index)
+                    if sync_telemetry is not None and advanced and playback_clock.playing:
+                        # How long after the word started (in real time) it got highlighted; seeks are left out
+                        late_ms = (current_time - float(word_data.starts[word_index])) * 1000.0 / playback_clock.rate
+                        sync_telemetry.word_rendered(root, late_ms, (time.perf_counter() - highlight_started) * 1000.0)
+                elif word_index is None and current_word is not None:
+                    transcript_view.clear_highlight()
                     current_word = None
-                    text_display.config(state=DISABLED)
-
-                # Update the timeline slider only if the user is not dragging it
-                if not is_slider_being_dragged and audio_duration > 0:
-                    position_ratio = current_time_ms
-                    position_ratio = max(0, min(position_ratio, audio_duration))  # Clamp between 0 and audio_duration
-                    timeline_slider.set(position_ratio)
 
-                # Update current time label
-                current_time_formatted = time.strftime('%H:%M:%S', time.gmtime(current_time_ms / 1000.0))
-                current_time_label.config(text=f"Current Time: {current_time_formatted}")
+                # The slider and the time label only need refreshing every update_interval
+                now = time.monotonic()
+                if now - last_labels_update >= update_interval / 1000.0 or not playback_clock.playing:
+                    last_labels_update = now
+
+                    # Update the timeline slider only if the user is not dragging it
+                    if not is_slider_being_dragged and audio_duration > 0:
+                        position_ratio = current_time_ms
+                        position_ratio = max(0, min(position_ratio, audio_duration))  # Clamp between 0 and audio_duration
+                        timeline_slider.set(position_ratio)
+
+                    # Update current time label
+                    current_time_formatted = time.strftime('%H:%M:%S', time.gmtime(current_time_ms / 1000.0))
+                    current_time_label.config(text=f"Current Time: {current_time_formatted}")
+
+                if sync_telemetry is not None and playback_clock.playing:
+                    # Compare against VLC's own time rather than the interpolated clock
+                    player_time_ms = player.get_time()
+                    sync_telemetry.record('clock_error_ms', current_time_ms - player_time_ms)
+                    if current_word is not None:
+                        sync_telemetry.drift(word_data, current_word, (player_time_ms + delay) / 1000.0)
+
+                # Wake up when the highlighted word is due to change
+                if playback_clock.playing:
+                    next_change = word_data.next_change(current_word if current_word is not None else -1)
+                    until_change_ms = (next_change - current_time) * 1000.0 / playback_clock.rate
+                    wait_ms = int(max(1, min(until_change_ms + 1, update_interval)))
 
         except Exception as e:
             print(f"Error during synchronization: {e}")
 
+        if sync_telemetry is not None:
+            sync_telemetry.record('tick_ms', (time.perf_counter() - tick_started) * 1000.0)
+
         # Schedule the next update
-        root.after(update_interval, update)
+        pending_update = root.after(wait_ms, update)
+
+    def wake():
+        """Cancel the scheduled update and run one as soon as Tk is idle."""
+        nonlocal pending_update
+        if pending_update is not None:
+            root.after_cancel(pending_update)
+        pending_update = root.after(0, update)
 
     # Start the update loop
-    root.after(update_interval, update)
+    pending_update = root.after(update_interval, update)
+    return wake
 
 # Playback control functions using VLC
 def play_audio():
@@ -144,6 +359,7 @@ def play_audio():
         if player is not None:
             player.play()
             set_playback_speed(playback_speed)
+            notify_playback_changed()
             status_label.config(text="Playing", fg="green")
     except Exception as e:
         print(f"Error in play_audio: {e}")
@@ -154,6 +370,7 @@ def pause_audio():
     try:
         if player is not None:
             player.pause()
+            notify_playback_changed()
             status_label.config(text="Paused", fg="orange")
     except Exception as e:
         print(f"Error in pause_audio: {e}")
@@ -164,6 +381,7 @@ def stop_audio():
     try:
         if player is not None:
             player.stop()
+            notify_playback_changed()
             status_label.config(text="Stopped", fg="blue")
     except Exception as e:
         print(f"Error in stop_audio: {e}")
@@ -173,9 +391,10 @@ def forward_15_seconds():
     """Skip forward by 15 seconds."""
     try:
         if player is not None:
-            current_time = player.get_time()
+            current_time = playback_clock.position_ms()
             new_time = min(current_time + 15000, audio_duration)
             player.set_time(int(new_time))
+            notify_playback_changed(int(new_time))
             status_label.config(text="Skipped Forward 15s", fg="blue")
     except Exception as e:
         print(f"Error in forward_15_seconds: {e}")
@@ -185,9 +404,10 @@ def back_15_seconds():
     """Skip backward by 15 seconds."""
     try:
         if player is not None:
-            current_time = player.get_time()
+            current_time = playback_clock.position_ms()
             new_time = max(current_time - 15000, 0)
             player.set_time(int(new_time))
+            notify_playback_changed(int(new_time))
             status_label.config(text="Skipped Backward 15s", fg="blue")
     except Exception as e:
         print(f"Error in back_15_seconds: {e}")
@@ -219,6 +439,7 @@ def seek_audio(event=None):
             new_time = float(timeline_slider.get())
             new_time = max(0, min(new_time, audio_duration))  # Clamp between 0 and audio_duration
             player.set_time(int(new_time))
+            notify_playback_changed(int(new_time))
             status_label.config(text="Playback position updated", fg="blue")
     except Exception as e:
         print(f"Error in seek_audio: {e}")
@@ -231,38 +452,54 @@ def set_playback_speed(value):
         playback_speed = float(value)
         if player is not None:
             player.set_rate(playback_speed)
+            notify_playback_changed()
     except Exception as e:
         print(f"Error setting playback speed: {e}")
 
-def create_display(word_data, audio_file_path):
-    """Initialize VLC player, set up the GUI, and start synchronization."""
-    global audio_duration, player, timeline_slider, is_slider_being_dragged, status_label
+def create_display(load_words, audio_file_path, start_time=None, chapters=None, info_dir=None):
+    """Initialize VLC player, set up the GUI, and start synchronization.
+
+    The window appears right away: load_words() (returning a WordTable) and the
+    chapter list run on background threads and VLC parses the media on its own,
+    and each part of the window is filled in when its data arrives. Duration
+    and chapters are cached next to the audio file, so later launches skip the
+    parsing altogether.
+
+    start_time (seconds) makes playback start there instead of at the beginning;
+    chapters, if given, are used instead of reading them from the audio file.
+    audio_file_path may also be the <book>.parts.json of a book made of several
+    files, which are then played one after another (see PartsPlayer). The
+    media info is cached in info_dir, the book's output folder.
+    """
+    global audio_duration, player, timeline_slider, is_slider_being_dragged, status_label, playback_clock
     try:
         # Initialize VLC player
         instance = vlc.Instance()
-        player = instance.media_player_new()
-        media = instance.media_new(audio_file_path)
-        player.set_media(media)
+        parts_index = load_parts_index(audio_file_path) if audio_file_path.endswith(PARTS_SUFFIX) else None
+        if parts_index is not None:
+            player = PartsPlayer(instance, parts_index, start_time)
+            # The parts index already knows the duration, and the parts stand in for missing chapters
+            media_info = {'duration_ms': player.get_length(),
+                          'chapters': chapters if chapters is not None else parts_as_chapters(parts_index)}
+        else:
+            player = instance.media_player_new()
+            media = instance.media_new(audio_file_path)
+            if start_time:
+                media.add_option(f"start-time={start_time:.2f}")
+            player.set_media(media)
+            # Duration and chapters from an earlier launch, if the audio file has not changed
+            media_info = load_media_info(audio_file_path, info_dir)
         player.stop()  # Ensure the player is stopped
+        playback_clock = PlaybackClock(player)
 
-        # Parse the media to get the duration
-        media.parse_with_options(vlc.MediaParseFlag.fetch_local, timeout=10)
-        # Wait until the media is parsed
-        parsed = media.get_parsed_status()
-        start_time = time.time()
-        while parsed != vlc.MediaParsedStatus.done and parsed != vlc.MediaParsedStatus.failed:
-            if time.time() - start_time > 10:
-                print("Media parsing timed out.")
-                break
-            time.sleep(0.1)
-            parsed = media.get_parsed_status()
-
-        # Get audio duration
-        audio_duration = media.get_duration()  # Duration in milliseconds
-
-        # Check if audio_duration is valid
-        if audio_duration <= 0:
-            audio_duration = 1  # Prevent division by zero errors
+        if media_info is not None:
+            audio_duration = media_info['duration_ms']
+            if chapters is None:
+                chapters = media_info['chapters']
+        else:
+            # Parsing runs on VLC's own thread; its status is polled from the Tk loop below
+            media.parse_with_options(vlc.MediaParseFlag.fetch_local, timeout=10000)
+            audio_duration = 1  # Prevent division by zero errors until the duration is known
 
         root = Tk()
         root.title("Audiobook Sync")
@@ -289,16 +526,29 @@ def create_display(word_data, audio_file_path):
         chapters_tree.configure(yscroll=scrollbar.set)
         scrollbar.pack(side=RIGHT, fill=Y)
 
-        # Extract and populate chapters
-        chapters = extract_chapters(audio_file_path)
-        for idx, chapter in enumerate(chapters, start=1):
-            # Format start_time to HH:MM:SS
-            start_time_formatted = time.strftime('%H:%M:%S', time.gmtime(chapter['start_time']))
-            chapters_tree.insert('', 'end', iid=idx, values=(f"{chapter['title']} ({start_time_formatted})",))
-
         # Bind double-click on a chapter to seek_audio
         chapters_tree.bind("<Double-1>", lambda event: on_chapter_select())
 
+        # Full-text search over the transcript
+        search_label = Label(chapters_frame, text="Search", font=("Helvetica", 14))
+        search_label.pack(pady=5)
+
+        search_entry = Entry(chapters_frame)
+        search_entry.pack(fill=X, padx=5)
+        search_entry.bind("<Return>", lambda event: on_search())
+
+        search_results = Listbox(chapters_frame, height=10)
+        search_results.pack(fill=BOTH, expand=True, padx=5, pady=5)
+        search_results.bind("<Double-1>", lambda event: on_search_result_select())
+        search_results.bind("<Return>", lambda event: on_search_result_select())
+        search_hits = []
+
+        # Filled in once the transcript has loaded
+        word_data = None
+        transcript_view = None
+        search_index = None
+        chapter_cache = None
+
         # Transcript Frame
         transcript_frame = Frame(paned_window)
         paned_window.add(transcript_frame)
@@ -307,20 +557,9 @@ def create_display(word_data, audio_file_path):
         text_display = Text(transcript_frame, wrap=WORD, font=("Helvetica", 16))
         text_display.pack(expand=True, fill=BOTH)
 
-        # Insert the entire transcript into the Text widget
-        transcript = ' '.join([word['word'] for word in word_data])
-        text_display.config(state=NORMAL)
-        text_display.insert('1.0', transcript)
+        text_display.insert('1.0', "Loading transcript...")
         text_display.config(state=DISABLED)
 
-        # Validate character indices
-        total_chars_in_text = len(transcript)
-        last_word_char_end = word_data[-1]['char_index_end'] if word_data else 0
-        if last_word_char_end != total_chars_in_text:
-            print(f"Warning: Last word char_index_end ({last_word_char_end}) does not match total_chars_in_text ({total_chars_in_text})")
-        else:
-            print("Character indices correctly mapped.")
-
         # Control Panel
         control_panel = Frame(root)
         control_panel.pack(fill=X)
@@ -380,14 +619,117 @@ def create_display(word_data, audio_file_path):
         total_time_label.pack(side=RIGHT)
 
         # Status Label
-        status_label = Label(root, text="Ready to play", fg="green")
+        status_label = Label(root, text="Loading transcript...", fg="blue")
         status_label.pack(side=BOTTOM, fill=X)
 
-        # Start the synchronization function
-        sync_audio_and_text(root, word_data, text_display, delay_slider, timeline_slider,
-                            current_time_label, total_time_label)
+        if sync_telemetry is not None:
+            # Overlay with the sync loop's timings, refreshed every second
+            telemetry_label = Label(root, text=sync_telemetry.overlay_text(), fg="gray", anchor='w')
+            telemetry_label.pack(side=BOTTOM, fill=X)
+
+            def refresh_telemetry():
+                telemetry_label.config(text=sync_telemetry.overlay_text())
+                root.after(1000, refresh_telemetry)
+            root.after(1000, refresh_telemetry)
 
         # Define helper functions inside create_display
+        def on_words_loaded(loaded):
+            """Show the transcript and start the synchronization once it has loaded."""
+            global wake_sync
+            nonlocal word_data, transcript_view, search_index, chapter_cache
+            if not loaded:
+                status_label.config(text="No word data loaded", fg="red")
+                return
+            word_data = loaded
+
+            # Only a window of the current chapter around the playback position lives in the widget;
+            # until the chapters are known the whole book counts as one
+            chapter_index = ChapterIndex(word_data, chapters)
+            chapter_cache = ChapterCache(word_data, chapter_index)
+            start_word = max(0, word_data.find(start_time or 0))
+            transcript_view = TranscriptView(text_display, word_data, highlight_color=highlight_color,
+                                             chapters=chapter_index, on_chapter_change=on_chapter_change)
+            transcript_view.show_chapter(chapter_index.chapter_of(start_word), start_word)
+
+            # Search covers the current chapter first; the book-wide index is built on a
+            # background thread once the chapter's own index is ready
+            search_index = SearchIndex(word_data)
+            BackgroundTask(chapter_cache.get, transcript_view.chapter,
+                           name="index-chapter").then(root, lambda _: search_index.start_background_build())
+
+            # Validate character indices
+            total_chars_in_text = len(word_data.text)
+            last_word_char_end = int(word_data.char_ends[-1]) if len(word_data) else 0
+            if last_word_char_end != total_chars_in_text:
+                print(f"Warning: Last word char_index_end ({last_word_char_end}) does not match total_chars_in_text ({total_chars_in_text})")
+            else:
+                print("Character indices correctly mapped.")
+
+            # Start the synchronization function
+            wake_sync = sync_audio_and_text(root, word_data, transcript_view, delay_slider, timeline_slider,
+                                            current_time_label, total_time_label)
+            status_label.config(text="Ready to play", fg="green")
+
+        def show_chapters(loaded):
+            """Populate the chapters panel."""
+            nonlocal chapters, chapter_cache
+            chapters = loaded or []
+            for idx, chapter in enumerate(chapters, start=1):
+                # Format start_time to HH:MM:SS
+                start_time_formatted = time.strftime('%H:%M:%S', time.gmtime(chapter['start_time']))
+                chapters_tree.insert('', 'end', iid=idx, values=(f"{chapter['title']} ({start_time_formatted})",))
+            cache_media_info()
+            if transcript_view is not None and chapters:
+                # The transcript loaded first and is shown as one range; narrow it to its chapter
+                chapter_index = ChapterIndex(word_data, chapters)
+                chapter_cache = ChapterCache(word_data, chapter_index)
+                shown_word = transcript_view.highlighted
+                if shown_word is None:
+                    shown_word = max(0, word_data.find(start_time or 0))
+                transcript_view.set_chapters(chapter_index, shown_word)
+
+        def on_chapter_change(chapter):
+            """Prefetch the chapter after the one now shown, and mark it in the chapters panel."""
+            chapter_cache.prefetch(chapter + 1)
+            if chapters and chapters_tree.exists(chapter + 1):
+                chapters_tree.selection_set(chapter + 1)
+                chapters_tree.see(chapter + 1)
+
+        def show_duration(duration_ms):
+            """Set the timeline to the audio duration once it is known."""
+            global audio_duration
+            audio_duration = max(duration_ms, 1)  # Prevent division by zero errors
+            timeline_slider.config(to=audio_duration)
+            total_duration_formatted = time.strftime('%H:%M:%S', time.gmtime(audio_duration / 1000.0))
+            total_time_label.config(text=f"Total Duration: {total_duration_formatted}")
+
+        parse_started = time.monotonic()
+
+        def poll_media_parsed():
+            """Wait for VLC to finish parsing the media without blocking the Tk loop."""
+            parsed = media.get_parsed_status()
+            if parsed != vlc.MediaParsedStatus.done and parsed != vlc.MediaParsedStatus.failed:
+                if time.monotonic() - parse_started > 10:
+                    print("Media parsing timed out.")
+                else:
+                    root.after(100, poll_media_parsed)
+                    return
+            show_duration(media.get_duration())  # Duration in milliseconds
+            cache_media_info()
+
+        def cache_media_info():
+            """Save duration and chapters for the next launch once both are known."""
+            if media_info is None and chapters is not None and audio_duration > 1:
+                save_media_info(audio_file_path, audio_duration, chapters, info_dir)
+
+        BackgroundTask(load_words, name="load-transcript").then(root, on_words_loaded)
+        if chapters is not None:
+            show_chapters(chapters)
+        else:
+            BackgroundTask(extract_chapters, audio_file_path, name="load-chapters").then(root, show_chapters)
+        if media_info is None:
+            root.after(100, poll_media_parsed)
+
         def set_slider_dragging(state):
             """Set the slider dragging flag."""
             global is_slider_being_dragged
@@ -398,25 +740,60 @@ def create_display(word_data, audio_file_path):
             set_slider_dragging(False)
             seek_audio()
 
+        def jump_to_word(word_index):
+            """Seek to a word and highlight it."""
+            if transcript_view is None:
+                return
+            # Land before the word by the highlight delay, so the sync loop keeps it highlighted
+            seek_time_ms = max(0, int(word_data.starts[word_index] * 1000) - delay)
+            if player is not None:
+                player.set_time(seek_time_ms)
+                notify_playback_changed(seek_time_ms)
+            transcript_view.highlight(word_index)
+
+        def on_search():
+            """Run the query in the search box and list the matches."""
+            query = search_entry.get()
+            if search_index is None:
+                status_label.config(text="The transcript is still loading", fg="blue")
+                return
+            scope = ""
+            if search_index.ready:
+                search_hits[:] = search_index.search(query)
+            else:
+                # Until the whole book is indexed, search the chapter on screen
+                search_hits[:] = chapter_cache.get(transcript_view.chapter).search(query)
+                scope = " in this chapter (the whole book is still being indexed)"
+            search_results.delete(0, END)
+            for word_index in search_hits:
+                start_time_formatted = time.strftime('%H:%M:%S', time.gmtime(word_data.starts[word_index]))
+                search_results.insert(END, f"{start_time_formatted}  {search_index.snippet(word_index, before=3)}")
+            status_label.config(text=f"{len(search_hits)} matches for \"{query}\"{scope}", fg="blue")
+
+        def on_search_result_select():
+            """Jump to the match selected in the results list."""
+            selection = search_results.curselection()
+            if selection:
+                word_index = search_hits[selection[0]]
+                jump_to_word(word_index)
+                status_label.config(text=f"Jumped to match at "
+                                         f"{time.strftime('%H:%M:%S', time.gmtime(word_data.starts[word_index]))}", fg="blue")
+
         def on_chapter_select():
             """Handle chapter selection from the Treeview."""
             selected_item = chapters_tree.focus()
             if selected_item:
-                chapter_text = chapters_tree.item(selected_item, 'values')[0]
-                # Extract start time from the chapter_text
-                # Assuming format: "Chapter Title (HH:MM:SS)"
-                if '(' in chapter_text and ')' in chapter_text:
-                    time_str = chapter_text.split('(')[-1].rstrip(')')
-                    try:
-                        h, m, s = map(float, time_str.split(':'))
-                        seek_time_ms = int((h * 3600 + m * 60 + s) * 1000)
-                        if player is not None:
-                            player.set_time(seek_time_ms)
-                            status_label.config(text=f"Jumped to chapter at {time_str}", fg="blue")
-                    except ValueError:
-                        print("Invalid time format in chapter.")
-                else:
-                    print("Invalid chapter format.")
+                # The item id is the chapter's number, counted from 1
+                chapter = int(selected_item) - 1
+                seek_time_ms = int(chapters[chapter]['start_time'] * 1000)
+                if player is not None:
+                    player.set_time(seek_time_ms)
+                    notify_playback_changed(seek_time_ms)
+                    time_str = time.strftime('%H:%M:%S', time.gmtime(chapters[chapter]['start_time']))
+                    status_label.config(text=f"Jumped to chapter at {time_str}", fg="blue")
+                if transcript_view is not None:
+                    # Show the chapter right away, also while paused
+                    transcript_view.show_chapter(chapter)
 
         return root
     except Exception as e:
@@ -425,20 +802,44 @@ def create_display(word_data, audio_file_path):
 
 def main():
     """Main function to load transcription, create display, and start GUI."""
+    parser = argparse.ArgumentParser(description="Play an audiobook with its transcript highlighted.")
     # Paths to the audio and transcription files
-    audio_file_path = "input/path/to/.m4b"
-    json_file_path = "output/path/to/.json"
-
-    # Load word-level transcription data
-    word_data = load_transcription(json_file_path)
-    if not word_data:
-        print("No word data loaded. Exiting.")
-        return
+    parser.add_argument('audio', nargs='?', default="input/path/to/.m4b")
+    parser.add_argument('json', nargs='?', default="output/path/to/.json")
+    parser.add_argument('--book', help="Open a book from the catalog (see catalog.py) instead of the paths")
+    parser.add_argument('--catalog', default=os.path.join("output", CATALOG_FILENAME))
+    parser.add_argument('--at', type=float, default=None, help="Start playback at this time in seconds")
+    parser.add_argument('--telemetry', action='store_true',
+                        help=f"Show sync loop timings and write them to {telemetry_path} on exit")
+    args = parser.parse_args()
+
+    global sync_telemetry
+    if args.telemetry:
+        sync_telemetry = SyncTelemetry()
+
+    chapters = None
+    if args.book:
+        # Word data and chapters come from the catalog, so the JSON is never parsed
+        paths = find_book(args.catalog, args.book)
+        if paths is None or not paths[1]:
+            print(f"Book {args.book} or its audio file is not in the catalog {args.catalog}.")
+            return
+        audio_file_path = paths[1]
+        info_dir = os.path.dirname(paths[0])
+        load_words = lambda: load_book_words(args.catalog, args.book)
+        chapters = load_book_chapters(args.catalog, args.book) or None
+    else:
+        audio_file_path = args.audio
+        info_dir = os.path.dirname(args.json)
+        # Word-level transcription data is loaded in the background while the window opens
+        load_words = lambda: load_word_data(args.json)
 
     # Create the display and start the GUI
-    root = create_display(word_data, audio_file_path)
+    root = create_display(load_words, audio_file_path, start_time=args.at, chapters=chapters, info_dir=info_dir)
     if root is not None:
         root.mainloop()
+        if sync_telemetry is not None:
+            sync_telemetry.dump(telemetry_path)
     else:
         print("Failed to create the GUI.")
 
@@ -0,0 +1,85 @@
+"""Cached audio metadata and background loading for the player.
+
+Parsing an audiobook with VLC to learn its duration and reading its chapter
+list with mutagen both take seconds on long files. The results are stored in
+a small sidecar (`<audio file name>.media.json`) in the book's output folder,
+keyed on the audio file's size and mtime, so later launches skip both steps.
+
+BackgroundTask runs a slow call on a daemon thread and hands its result back
+to the Tk thread by polling with `after`, since Tk widgets must only be
+touched from the thread running the main loop.
+"""
+import json
+import os
+import threading
+
+from common import write_json_atomic
+
+MEDIA_INFO_SUFFIX = ".media.json"
+
+def media_info_path(audio_file_path, info_dir=None):
+    """Sidecar of an audio file in info_dir (the book's output folder), or next to the file without one."""
+    folder = info_dir if info_dir is not None else os.path.dirname(audio_file_path)
+    return os.path.join(folder, os.path.basename(audio_file_path) + MEDIA_INFO_SUFFIX)
+
+def load_media_info(audio_file_path, info_dir=None):
+    """Return the cached {'duration_ms', 'chapters'} of an audio file, or None if missing or stale."""
+    try:
+        with open(media_info_path(audio_file_path, info_dir), 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        stat = os.stat(audio_file_path)
+        if info.get('size') != stat.st_size or info.get('mtime_ns') != stat.st_mtime_ns:
+            return None
+        return info
+    except (OSError, ValueError):
+        return None
+
+def save_media_info(audio_file_path, duration_ms, chapters, info_dir=None):
+    """Cache the duration and chapters of an audio file; failures are only reported."""
+    try:
+        stat = os.stat(audio_file_path)
+        info = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'duration_ms': duration_ms,
+            'chapters': chapters,
+        }
+        write_json_atomic(info, media_info_path(audio_file_path, info_dir))
+    except Exception as e:
+        print(f"Error caching media info for {audio_file_path}: {e}")
+
+class BackgroundTask:
+    """Runs function(*args) on a daemon thread; then() delivers the result on the Tk thread."""
+
+    def __init__(self, function, *args, name=None):
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(function, args), name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self, function, args):
+        try:
+            self.result = function(*args)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def then(self, widget, callback, poll_ms=50):
+        """Call callback(result) from widget's event loop once the task has finished.
+
+        If the task failed, the error is printed and callback receives None.
+        """
+        def poll():
+            if not self.done:
+                widget.after(poll_ms, poll)
+                return
+            if self.error is not None:
+                print(f"Error in background task {self._thread.name}: {self.error}")
+            callback(self.result)
+        widget.after(0, poll)
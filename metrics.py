@@ -0,0 +1,209 @@
+"""Timing and resource metrics for the transcription pipeline.
+
+Each stage (converting a file, loading the model, transcribing a book, a
+whole conversion pass) is wrapped in `measure`, which records:
+
+    wall_seconds    elapsed time
+    cpu_seconds     user + system time of this process and of its child
+                    processes that have exited (ffmpeg, finished worker pools)
+    audio_seconds   length of the audio the stage processed, if known
+    rtf             real-time factor, wall_seconds / audio_seconds (below 1
+                    is faster than real time)
+    peak_rss_mb     highest resident memory so far of this process or of any
+                    finished child, whichever is larger
+
+Records are kept in `recorder`; transcribe.py writes each book's records to
+`<book>.metrics.json` next to its transcription and a summary of the whole
+run to `output/run_metrics.json`.
+"""
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RUN_METRICS_FILENAME = "run_metrics.json"
+BOOK_METRICS_SUFFIX = ".metrics.json"
+
+def cpu_seconds():
+    """CPU time used so far by this process and its exited children."""
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+def peak_rss_mb():
+    """Peak resident memory of this process or its largest exited child, in MB (None if unknown)."""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+class StageRecord:
+    """Metrics of one run of a stage; audio_seconds may be filled in while the stage runs."""
+
+    def __init__(self, stage, book=None, audio_seconds=None):
+        self.stage = stage
+        self.book = book
+        self.audio_seconds = audio_seconds
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.peak_rss_mb = None
+        self.failed = False
+
+    @property
+    def rtf(self):
+        if self.wall_seconds is None or not self.audio_seconds:
+            return None
+        return self.wall_seconds / self.audio_seconds
+
+    def to_dict(self):
+        return {
+            'stage': self.stage,
+            'book': self.book,
+            'wall_seconds': round(self.wall_seconds, 3),
+            'cpu_seconds': round(self.cpu_seconds, 3),
+            'audio_seconds': round(self.audio_seconds, 3) if self.audio_seconds else self.audio_seconds,
+            'rtf': round(self.rtf, 4) if self.rtf is not None else None,
+            'peak_rss_mb': self.peak_rss_mb,
+            'failed': self.failed,
+        }
+
+class MetricsRecorder:
+    """Collects the stage records of a run; safe to use from several threads."""
+
+    def __init__(self):
+        self.records = []
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def add(self, records):
+        """Add record dicts, e.g. those returned by a worker process (see take)."""
+        with self._lock:
+            self.records.extend(records)
+
+    def take(self):
+        """Remove and return all records, to send them back from a worker process."""
+        with self._lock:
+            records, self.records = self.records, []
+        return records
+
+    def book_records(self, book):
+        with self._lock:
+            return [record for record in self.records if record['book'] == book]
+
+    def forget(self, book):
+        """Drop a book's records once they are written, so a long-running service does not accumulate them."""
+        with self._lock:
+            self.records = [record for record in self.records if record['book'] != book]
+
+    def summary(self):
+        """Totals per stage: count, wall/CPU/audio seconds, overall RTF and peak RSS."""
+        with self._lock:
+            records = list(self.records)
+        stages = {}
+        for record in records:
+            totals = stages.setdefault(record['stage'], {
+                'count': 0, 'failed': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                'audio_seconds': 0.0, 'peak_rss_mb': None})
+            totals['count'] += 1
+            totals['failed'] += int(record['failed'])
+            totals['wall_seconds'] += record['wall_seconds']
+            totals['cpu_seconds'] += record['cpu_seconds']
+            totals['audio_seconds'] += record['audio_seconds'] or 0.0
+            if record['peak_rss_mb'] is not None:
+                totals['peak_rss_mb'] = max(totals['peak_rss_mb'] or 0.0, record['peak_rss_mb'])
+        for totals in stages.values():
+            totals['rtf'] = (round(totals['wall_seconds'] / totals['audio_seconds'], 4)
+                             if totals['audio_seconds'] else None)
+            for key in ('wall_seconds', 'cpu_seconds', 'audio_seconds'):
+                totals[key] = round(totals[key], 3)
+        return {
+            'started': self.started,
+            'wall_seconds': round(time.time() - self.started, 3),
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': stages,
+        }
+
+recorder = MetricsRecorder()
+
+@contextlib.contextmanager
+def measure(stage, book=None, audio_seconds=None):
+    """Record the metrics of the enclosed block as one run of stage.
+
+    Yields the StageRecord, so audio_seconds can be set once it is known.
+    A block that raises is still recorded, marked as failed.
+    """
+    record = StageRecord(stage, book, audio_seconds)
+    wall_start = time.perf_counter()
+    cpu_start = cpu_seconds()
+    try:
+        yield record
+    except BaseException:
+        record.failed = True
+        raise
+    finally:
+        record.wall_seconds = time.perf_counter() - wall_start
+        record.cpu_seconds = cpu_seconds() - cpu_start
+        record.peak_rss_mb = peak_rss_mb()
+        recorder.add([record.to_dict()])
+
+@contextlib.contextmanager
+def profile(output_path):
+    """Profile the enclosed block with cProfile and save the stats to output_path.
+
+    The .prof file opens with `python -m pstats`, snakeviz and similar tools.
+    With output_path None the block runs unprofiled. To sample a run with
+    py-spy instead, attach it to the process: `py-spy record --pid <pid>`.
+    """
+    if output_path is None:
+        yield
+        return
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(output_path)
+        print(f"Profile written: {output_path}")
+
+def book_metrics_path(output_dir, book):
+    return os.path.join(output_dir, f"{book}{BOOK_METRICS_SUFFIX}")
+
+def write_book_metrics(book, output_dir):
+    """Write the records of one book to <book>.metrics.json in output_dir."""
+    path = book_metrics_path(output_dir, book)
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'book': book, 'stages': recorder.book_records(book)}, f, indent=2)
+    except Exception as e:
+        print(f"Error writing metrics for {book}: {e}")
+    return path
+
+def write_run_summary(output_folder):
+    """Print the totals of the run and save them, with every record, to run_metrics.json."""
+    summary = recorder.summary()
+    print(f"Run finished in {summary['wall_seconds']:.1f}s, peak RSS {summary['peak_rss_mb']} MB")
+    for stage, totals in summary['stages'].items():
+        rtf = f"{totals['rtf']:.3f}" if totals['rtf'] is not None else "-"
+        print(f"  {stage:<14} x{totals['count']:<4} wall {totals['wall_seconds']:>9.1f}s  "
+              f"cpu {totals['cpu_seconds']:>9.1f}s  audio {totals['audio_seconds']:>9.1f}s  RTF {rtf}")
+    path = os.path.join(output_folder, RUN_METRICS_FILENAME)
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(dict(summary, records=recorder.records), f, indent=2)
+    except Exception as e:
+        print(f"Error writing run metrics: {e}")
+    return summary
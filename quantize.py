@@ -0,0 +1,160 @@
+"""Dynamic int8 quantization of Whisper models for CPU inference.
+
+Most of a Whisper model's CPU time goes to its linear layers. Dynamic
+quantization stores their weights as int8 and quantizes activations on the
+fly, which typically makes the larger models run at the cost of a model one
+or two sizes smaller. Whisper uses its own Linear subclass, which
+torch's quantize_dynamic does not recognise, so those layers are turned back
+into plain torch Linear layers first (they only differ in fp16 casting,
+which does not apply on the CPU).
+
+Quantizing takes a while, so the quantized model is cached next to whisper's
+own downloads (~/.cache/whisper) and loaded from there on later runs.
+
+Compare a quantized model with the full-precision one on your own audio:
+    python quantize.py speech.wav --model small --minutes 5
+which prints and saves (quantization_report.json) the real-time factor of
+both and how well their words and timestamps agree.
+"""
+import argparse
+import difflib
+import json
+import os
+import time
+
+def cache_path(model_name):
+    """Where the quantized model is cached; tied to the torch version that pickled it."""
+    import torch
+
+    cache_dir = os.path.join(os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "whisper")
+    return os.path.join(cache_dir, f"{model_name}-int8-torch{torch.__version__.split('+')[0]}.pt")
+
+def quantize_model(model):
+    """Quantize the linear layers of a CPU Whisper model to int8, in place of the model."""
+    import torch
+    from whisper.model import Linear as WhisperLinear
+
+    for module in model.modules():
+        if isinstance(module, WhisperLinear):
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _quantize_and_cache(model_name, path):
+    import torch
+    import whisper_timestamped as whisper
+
+    started = time.perf_counter()
+    model = quantize_model(whisper.load_model(model_name, device='cpu'))
+    print(f"Quantized {model_name} to int8 in {time.perf_counter() - started:.1f}s")
+    # Per process, so processes caching the same model never write the same file
+    partial_path = f"{path}.{os.getpid()}.part"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        torch.save(model, partial_path)
+        os.replace(partial_path, path)
+    except Exception as e:
+        print(f"Error caching quantized model: {e}")
+        try:
+            os.remove(partial_path)
+        except OSError:
+            pass
+    return model
+
+def load_quantized_model(model_name):
+    """Load the int8 model from the cache, or quantize the full-precision model and cache it."""
+    import torch
+
+    path = cache_path(model_name)
+    if os.path.exists(path):
+        try:
+            return torch.load(path, map_location='cpu', weights_only=False)
+        except Exception as e:
+            print(f"Error loading cached quantized model {path}, quantizing again: {e}")
+    return _quantize_and_cache(model_name, path)
+
+def ensure_quantized_model(model_name):
+    """Quantize and cache the int8 model unless it is cached already, e.g. before starting worker processes."""
+    path = cache_path(model_name)
+    if not os.path.exists(path):
+        _quantize_and_cache(model_name, path)
+
+def _words(result):
+    return [word for segment in result['segments'] for word in segment.get('words', [])]
+
+def agreement(reference, candidate):
+    """Compare the words of two results: share of matching words and start time differences of the matches."""
+    from search_index import normalize
+
+    reference_words, candidate_words = _words(reference), _words(candidate)
+    matcher = difflib.SequenceMatcher(None, [normalize(word['text']) for word in reference_words],
+                                      [normalize(word['text']) for word in candidate_words], autojunk=False)
+    differences = sorted(round(abs(reference_words[a + k]['start'] - candidate_words[b + k]['start']), 3)
+                         for a, b, size in matcher.get_matching_blocks() for k in range(size))
+    matched = len(differences)
+
+    def quantile(fraction):
+        return round(differences[min(len(differences) - 1, int(fraction * len(differences)))], 3) if differences else None
+
+    return {
+        'reference_words': len(reference_words),
+        'candidate_words': len(candidate_words),
+        'matched_words': matched,
+        'word_agreement': round(matched / max(len(reference_words), 1), 4),
+        'start_difference_mean': round(sum(differences) / matched, 3) if matched else None,
+        'start_difference_median': quantile(0.5),
+        'start_difference_p95': quantile(0.95),
+        'within_100ms': round(sum(1 for d in differences if d <= 0.1) / matched, 4) if matched else None,
+    }
+
+def compare(wav_path, model_name, minutes=5, language='en', threads=None):
+    """Transcribe the start of a WAV with the full-precision and the int8 model and compare them."""
+    import numpy as np
+    import torch
+    import whisper_timestamped as whisper
+
+    import transcribe
+
+    if threads:
+        torch.set_num_threads(threads)
+    samples = np.concatenate(list(transcribe.read_wav_blocks(wav_path)))[:int(minutes * 60 * transcribe.SAMPLE_RATE)]
+    audio_seconds = len(samples) / transcribe.SAMPLE_RATE
+
+    report = {'wav': wav_path, 'model': model_name, 'audio_seconds': audio_seconds, 'threads': torch.get_num_threads()}
+    results = {}
+    for name, load in (('fp32', lambda: whisper.load_model(model_name, device='cpu')),
+                       ('int8', lambda: load_quantized_model(model_name))):
+        started = time.perf_counter()
+        model = load()
+        load_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        results[name] = transcribe.transcribe_samples(model, samples, language)
+        seconds = time.perf_counter() - started
+        report[name] = {'load_seconds': round(load_seconds, 2), 'transcribe_seconds': round(seconds, 2),
+                        'rtf': round(seconds / audio_seconds, 4)}
+        print(f"{name}: loaded in {load_seconds:.1f}s, RTF {seconds / audio_seconds:.3f}")
+        del model
+    report['speedup'] = round(report['fp32']['transcribe_seconds'] / report['int8']['transcribe_seconds'], 2)
+    report['agreement'] = agreement(results['fp32'], results['int8'])
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare an int8 quantized Whisper model with full precision.")
+    parser.add_argument('wav', help="16 kHz mono WAV with speech, e.g. output/YourBook1/YourBook1.wav")
+    parser.add_argument('--model', default='base')
+    parser.add_argument('--minutes', type=float, default=5, help="How much of the WAV to transcribe")
+    parser.add_argument('--language', default='en')
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--output', default="quantization_report.json")
+    args = parser.parse_args()
+
+    report = compare(args.wav, args.model, args.minutes, args.language, args.threads)
+    agreement_report = report['agreement']
+    print(f"Speedup: {report['speedup']}x  Word agreement: {agreement_report['word_agreement']:.1%}  "
+          f"Start time difference: median {agreement_report['start_difference_median']}s, "
+          f"p95 {agreement_report['start_difference_p95']}s")
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Cache of finished transcriptions, keyed by the audio itself and the settings that made them.
+
+Whether a book needs transcribing used to be decided by the .txt and .json
+next to its WAV. That redoes hours of inference when a book is renamed or
+moved, and silently keeps an old result when the model or language changes.
+Here each result is stored under a key made from a fingerprint of the
+decoded samples (not the file, so re-encoding to identical PCM still hits)
+plus the model name, language and decoding options. Any change to one of
+them gives a new key, and a hit restores the result without inference.
+
+Entries are gzipped JSON files in output/.result_cache/. The cache is kept
+under a size limit by evicting the least recently used entries; a hit
+refreshes the entry's modification time, which serves as its last use.
+
+The PCM fingerprint and the key of the result next to a WAV are remembered
+in <book>.cache.json, keyed on the WAV's size and mtime, so unchanged books
+are not hashed again on every run.
+"""
+import gzip
+import hashlib
+import json
+import os
+
+from common import atomic_open, write_json_atomic
+
+RESULT_CACHE_FOLDER = ".result_cache"
+CACHE_INFO_SUFFIX = ".cache.json"
+
+def pcm_fingerprint(wav_path, block_frames=1 << 20):
+    """sha256 of the format and samples of a WAV file, leaving out the rest of its header."""
+    import wave
+
+    with wave.open(wav_path, 'rb') as wav:
+        digest = hashlib.sha256(f"{wav.getnchannels()}/{wav.getsampwidth()}/{wav.getframerate()}".encode())
+        while True:
+            data = wav.readframes(block_frames)
+            if not data:
+                break
+            digest.update(data)
+    return digest.hexdigest()
+
+def result_key(fingerprint, model_name, language, options):
+    """Cache key of a result: the audio fingerprint, model, language and (JSON-serialisable) options."""
+    settings = json.dumps({'model': model_name, 'language': language, 'options': options}, sort_keys=True)
+    return hashlib.sha256(f"{fingerprint}\n{settings}".encode()).hexdigest()
+
+def cache_info_path(wav_path):
+    return os.path.splitext(wav_path)[0] + CACHE_INFO_SUFFIX
+
+def _load_cache_info(wav_path):
+    """Return the cache info of a WAV if it was written for the WAV as it is now, else {}."""
+    try:
+        with open(cache_info_path(wav_path), 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        stat = os.stat(wav_path)
+        if info.get('wav_size') == stat.st_size and info.get('wav_mtime_ns') == stat.st_mtime_ns:
+            return info
+    except (OSError, ValueError):
+        pass
+    return {}
+
+def _save_cache_info(wav_path, info):
+    path = cache_info_path(wav_path)
+    try:
+        stat = os.stat(wav_path)
+        info = dict(info, wav_size=stat.st_size, wav_mtime_ns=stat.st_mtime_ns)
+        write_json_atomic(info, path)
+    except Exception as e:
+        print(f"Error writing {path}: {e}")
+
+def wav_fingerprint(wav_path):
+    """PCM fingerprint of a WAV, hashed only when the WAV changed since it was last taken."""
+    info = _load_cache_info(wav_path)
+    if 'pcm_sha256' not in info:
+        info['pcm_sha256'] = pcm_fingerprint(wav_path)
+        _save_cache_info(wav_path, info)
+    return info['pcm_sha256']
+
+def saved_result_key(wav_path):
+    """Key of the transcription saved next to a WAV, or None if not recorded (or the WAV changed)."""
+    return _load_cache_info(wav_path).get('result_key')
+
+def record_result_key(wav_path, key):
+    """Remember which key the transcription saved next to a WAV was made with."""
+    info = _load_cache_info(wav_path)
+    info['result_key'] = key
+    _save_cache_info(wav_path, info)
+
+class ResultCache:
+    """Gzipped results in a folder, evicted least recently used first beyond max_bytes."""
+
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.folder, f"{key}.json.gz")
+
+    def get(self, key):
+        """Return the cached result for key, or None."""
+        path = self.path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                result = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError) as e:
+            print(f"Error reading cached result {path}, dropping it: {e}")
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            pass
+        return result
+
+    def put(self, key, result):
+        """Store a result under key, then evict old entries beyond the size limit."""
+        path = self.path(key)
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            with atomic_open(path, 'wt', opener=gzip.open, encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, separators=(',', ':'))
+        except Exception as e:
+            print(f"Error caching result {path}: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in max_bytes."""
+        try:
+            entries = [os.path.join(self.folder, name) for name in os.listdir(self.folder) if name.endswith(".json.gz")]
+            stats = sorted(((os.stat(path), path) for path in entries), key=lambda item: item[0].st_mtime)
+        except OSError as e:
+            print(f"Error listing the result cache: {e}")
+            return
+        total = sum(stat.st_size for stat, _ in stats)
+        # The newest entry is kept even if it alone exceeds the limit
+        for stat, path in stats[:-1]:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= stat.st_size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
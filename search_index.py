@@ -0,0 +1,139 @@
+"""In-memory full-text search over the words of a transcript.
+
+The index is built from a WordTable: every word is normalised (lower case,
+punctuation removed) and mapped to a token id, and the positions of each
+token are stored contiguously in one array (a CSR-style inverted index). A
+query is a sequence of terms that must appear as consecutive words; a term
+ending in '*' matches every word starting with it. Looking up a term is a
+dict lookup plus an array slice, and phrases are narrowed with sorted-array
+intersections, so queries take milliseconds even on million-word books.
+"""
+import bisect
+import re
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+# Punctuation removed when normalising words and queries, including the
+# typographic quotes and dashes whisper tends to emit
+_PUNCTUATION = re.compile(r"[^\w\s]+|_")
+
+def normalize(text):
+    """Lower-case text and strip its diacritics and punctuation, as words are stored in the index.
+
+    The library catalog (catalog.py) indexes and queries normalised text too,
+    so both searches treat "don't", "well-known" and "café" the same way.
+    """
+    text = text.lower()
+    if not text.isascii():
+        text = ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+    return _PUNCTUATION.sub('', text)
+
+def parse_query(query):
+    """Split a query into (term, is_prefix) pairs; a trailing '*' marks a prefix term."""
+    terms = []
+    for raw in query.split():
+        is_prefix = raw.endswith('*')
+        term = normalize(raw.rstrip('*'))
+        if term:
+            terms.append((term, is_prefix))
+    return terms
+
+class SearchIndex:
+    """Inverted index over a WordTable; build() can run on a background thread."""
+
+    def __init__(self, word_data):
+        self.word_data = word_data
+        self.token_ids = {}  # token -> id
+        self.vocabulary = []  # tokens in sorted order, for prefix lookups
+        self.vocabulary_ids = []  # token id of each entry of vocabulary
+        self.postings = None  # token positions grouped by token id, ascending within a token
+        self.offsets = None  # postings[offsets[i]:offsets[i + 1]] are the positions of token i
+        # Word index of each token position; words that are only punctuation have no token,
+        # so phrases run across them (like in the catalog's FTS index). None when every word has one
+        self.token_words = None
+        self.build_seconds = None
+        self._built = threading.Event()
+
+    @property
+    def ready(self):
+        return self._built.is_set()
+
+    def start_background_build(self):
+        """Build the index on a daemon thread, so loading the book is not delayed."""
+        threading.Thread(target=self.build, name="search-index", daemon=True).start()
+
+    def build(self):
+        started = time.perf_counter()
+        text = normalize(self.word_data.text)
+        tokens = text.split(' ')
+        if len(tokens) != len(self.word_data):
+            # A word contained a space of its own; normalise word by word instead
+            tokens = [normalize(self.word_data.word(i)) for i in range(len(self.word_data))]
+        if '' in tokens:
+            self.token_words = np.array([i for i, token in enumerate(tokens) if token], dtype=np.int64)
+            tokens = [token for token in tokens if token]
+
+        token_ids = self.token_ids
+        ids = np.fromiter((token_ids.setdefault(token, len(token_ids)) for token in tokens),
+                          dtype=np.int32, count=len(tokens))
+        # A stable sort keeps the positions of each token in ascending order
+        self.postings = np.argsort(ids, kind='stable').astype(np.int64)
+        counts = np.bincount(ids, minlength=len(token_ids))
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.vocabulary = sorted(token_ids)
+        self.vocabulary_ids = [token_ids[token] for token in self.vocabulary]
+        self.build_seconds = time.perf_counter() - started
+        self._built.set()
+
+    def wait(self, timeout=None):
+        """Wait for a background build to finish; returns whether the index is ready."""
+        return self._built.wait(timeout)
+
+    def _positions(self, token_id):
+        return self.postings[self.offsets[token_id]:self.offsets[token_id + 1]]
+
+    def term_positions(self, term, is_prefix=False):
+        """Return the sorted token positions of the words matching one normalised term."""
+        if not is_prefix:
+            token_id = self.token_ids.get(term)
+            return self._positions(token_id) if token_id is not None else np.empty(0, dtype=np.int64)
+
+        # Every token in the sorted vocabulary between term and term + max char starts with term
+        low = bisect.bisect_left(self.vocabulary, term)
+        high = bisect.bisect_left(self.vocabulary, term + '\U0010ffff')
+        matches = [self._positions(self.vocabulary_ids[i]) for i in range(low, high)]
+        if not matches:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(matches))
+
+    def search(self, query, limit=200):
+        """Return the first word index of each match of query, in book order (at most limit)."""
+        self.wait()
+        terms = parse_query(query)
+        if not terms:
+            return []
+
+        # Start from the rarest term and check the others at their offsets in the phrase
+        matches = [(offset, self.term_positions(term, is_prefix)) for offset, (term, is_prefix) in enumerate(terms)]
+        matches.sort(key=lambda match: len(match[1]))
+        candidates = None
+        for offset, positions in matches:
+            positions = positions - offset
+            if candidates is None:
+                candidates = positions
+            else:
+                # Positions of different tokens never coincide, so both arrays are unique
+                candidates = candidates[np.isin(candidates, positions, assume_unique=True)]
+            if not len(candidates):
+                return []
+        candidates = candidates[candidates >= 0][:limit]
+        return (self.token_words[candidates] if self.token_words is not None else candidates).tolist()
+
+    def snippet(self, index, before=6, after=10):
+        """Return the words around word index, for showing a match in context."""
+        first = max(0, index - before)
+        last = min(len(self.word_data) - 1, index + after)
+        return self.word_data.text[int(self.word_data.char_starts[first]):int(self.word_data.char_ends[last])]
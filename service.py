@@ -0,0 +1,332 @@
+"""Resident transcription service.
+
+Keeps the Whisper model loaded between books and runs conversion and
+transcription as a two-stage pipeline, so the next book is converted while
+the current one is being transcribed. Jobs come from the watched input/
+folder and from job files dropped into queue/ (see `submit`).
+
+Usage:
+    python service.py                 # run the service
+    python service.py submit FILE...  # queue audio files from anywhere
+    python service.py status          # print job status and throughput
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+
+import metrics
+import transcribe
+
+STATUS_FILENAME = "service_status.json"
+QUEUE_FOLDER = os.path.join(transcribe.project_folder, "queue")
+POLL_INTERVAL = 5  # Seconds between scans of the input and queue folders
+
+class TranscriptionService:
+    """Watches for new audio files and pushes them through convert -> transcribe."""
+
+    def __init__(self, input_folder, output_folder, queue_folder, model_name, language,
+                 workers=1, chunk_seconds=600, vad=False, batch_size=1, threads=None,
+                 quantize=False):
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        self.queue_folder = queue_folder
+        self.model_name = model_name
+        self.language = language
+        self.workers = workers
+        self.chunk_seconds = chunk_seconds
+        self.vad = vad
+        self.batch_size = batch_size
+        self.threads = threads
+        self.quantize = quantize
+
+        self.manifest_path = os.path.join(output_folder, transcribe.MANIFEST_FILENAME)
+        self.status_path = os.path.join(output_folder, STATUS_FILENAME)
+        self.started = time.time()
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.jobs = []
+        self.seen = {}  # input path -> (size, mtime) of files already queued
+        self.candidates = {}  # input path -> (size, mtime) seen on the previous scan
+
+        self.pending = queue.Queue()
+        # Only one converted book waits for the model, bounding the WAVs on disk
+        self.converted = queue.Queue(maxsize=1)
+
+        self.model = None
+        self.pool = None
+
+    def submit(self, input_path):
+        """Add a job for input_path and hand it to the conversion stage."""
+        job = {
+            'id': len(self.jobs) + 1,
+            'input': input_path,
+            'state': 'queued',
+            'submitted': time.time(),
+        }
+        with self.lock:
+            self.jobs.append(job)
+        print(f"Queued job {job['id']}: {input_path}")
+        self.pending.put(job)
+        self.write_status()
+
+    def scan_input(self):
+        """Queue new or changed files in the input folder once their size has settled."""
+        try:
+            filenames = sorted(os.listdir(self.input_folder))
+        except Exception as e:
+            print(f"Error accessing input folder: {e}")
+            return
+
+        for filename in filenames:
+            input_path = os.path.join(self.input_folder, filename)
+            if os.path.isdir(input_path):
+                continue
+            _, ext = os.path.splitext(filename)
+            if ext.lower() not in transcribe.FFMPEG_EXTENSIONS + transcribe.MP3_EXTENSIONS:
+                continue
+
+            try:
+                stat = os.stat(input_path)
+            except OSError:
+                # Deleted or renamed since the listing; the next scan sees it as it is then
+                self.candidates.pop(input_path, None)
+                continue
+            signature = (stat.st_size, stat.st_mtime)
+            if self.seen.get(input_path) == signature:
+                continue
+            # A file still being copied changes between scans; wait until it is stable
+            if self.candidates.get(input_path) == signature:
+                del self.candidates[input_path]
+                self.seen[input_path] = signature
+                self.submit(input_path)
+            else:
+                self.candidates[input_path] = signature
+
+    def scan_queue(self):
+        """Take job files written by `python service.py submit` out of the queue folder."""
+        try:
+            filenames = sorted(f for f in os.listdir(self.queue_folder) if f.endswith('.json'))
+        except Exception as e:
+            print(f"Error accessing queue folder: {e}")
+            return
+
+        for filename in filenames:
+            job_path = os.path.join(self.queue_folder, filename)
+            job_file = transcribe.load_json_file(job_path, None)
+            try:
+                os.remove(job_path)
+            except OSError as e:
+                # Gone already, e.g. taken by another service; it must not run twice
+                print(f"Skipping job file {job_path}: {e}")
+                continue
+            if not job_file or not os.path.isfile(job_file.get('path', '')):
+                print(f"Ignoring invalid job file: {job_path}")
+                continue
+            self.submit(job_file['path'])
+
+    def set_state(self, job, state, **fields):
+        with self.lock:
+            job['state'] = state
+            job.update(fields)
+        self.write_status()
+
+    def write_status(self):
+        """Write job states and throughput to the status file."""
+        with self.lock:
+            finished = [job for job in self.jobs if job['state'] == 'done']
+            audio_seconds = sum(job.get('audio_seconds', 0) for job in finished)
+            transcribe_seconds = sum(job.get('transcribe_seconds', 0) for job in finished)
+            uptime = time.time() - self.started
+            status = {
+                'pid': os.getpid(),
+                'model': self.model_name,
+                'workers': self.workers,
+                'started': self.started,
+                'updated': time.time(),
+                'jobs_done': len(finished),
+                'jobs_failed': sum(job['state'] == 'failed' for job in self.jobs),
+                'jobs_waiting': sum(job['state'] in ('queued', 'converted') for job in self.jobs),
+                'audio_hours_done': round(audio_seconds / 3600, 3),
+                # Real-time factor: seconds of inference per second of audio
+                'real_time_factor': round(transcribe_seconds / audio_seconds, 4) if audio_seconds else None,
+                'audio_hours_per_hour': round(audio_seconds / uptime, 3) if uptime else None,
+                'jobs': list(self.jobs),
+            }
+            try:
+                transcribe.write_json_atomic(status, self.status_path)
+            except Exception as e:
+                print(f"Error writing service status: {e}")
+
+    def convert_loop(self):
+        """Conversion stage: turn queued inputs into WAV files."""
+        manifest = transcribe.load_json_file(self.manifest_path, {})
+        while not self.stop_event.is_set():
+            try:
+                job = self.pending.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            self.set_state(job, 'converting')
+            started = time.time()
+            try:
+                wav_path, needs_conversion = transcribe.plan_conversion(job['input'], self.output_folder, manifest)
+                if wav_path is None:
+                    raise ValueError("unsupported or unwritable input")
+                if needs_conversion:
+                    entry = transcribe.convert_file(job['input'], wav_path)
+                    if entry is None:
+                        raise RuntimeError("conversion failed")
+                    manifest[os.path.basename(job['input'])] = entry
+                transcribe.write_json_atomic(manifest, self.manifest_path)
+            except Exception as e:
+                print(f"Error converting {job['input']}: {e}")
+                self.set_state(job, 'failed', error=str(e))
+                continue
+
+            self.set_state(job, 'converted', wav=wav_path, reconverted=needs_conversion,
+                           convert_seconds=round(time.time() - started, 2))
+            # Blocks while the previous book is still being transcribed
+            while not self.stop_event.is_set():
+                try:
+                    self.converted.put(job, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+
+    def transcribe_loop(self):
+        """Transcription stage: run the warm model over converted WAV files."""
+        while not self.stop_event.is_set():
+            try:
+                job = self.converted.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            wav_path = job['wav']
+            base_path = os.path.splitext(wav_path)[0]
+            txt_output_path = f"{base_path}.txt"
+            json_output_path = f"{base_path}.json"
+            audio_seconds = transcribe.wav_duration(wav_path)
+
+            # A new conversion means the old transcription belongs to different audio
+            if (not job['reconverted'] and os.path.exists(txt_output_path)
+                    and os.path.exists(json_output_path)):
+                print(f"Transcription already exists for: {wav_path}, skipping...")
+                self.set_state(job, 'skipped', audio_seconds=audio_seconds)
+                continue
+
+            self.set_state(job, 'transcribing', audio_seconds=audio_seconds)
+            started = time.time()
+            checkpoint_dir = f"{base_path}.checkpoint"
+            try:
+                result = transcribe.transcribe_wav(wav_path, self.model, self.model_name, self.language,
+                                                   self.workers, self.chunk_seconds, pool=self.pool,
+                                                   checkpoint_dir=checkpoint_dir, vad=self.vad,
+                                                   batch_size=self.batch_size, quantize=self.quantize)
+                transcribe.save_transcription(result, txt_output_path, json_output_path)
+                transcribe.remove_checkpoint(checkpoint_dir)
+            except Exception as e:
+                print(f"Error transcribing {wav_path}: {e}")
+                self.set_state(job, 'failed', error=str(e))
+                metrics.recorder.forget(os.path.basename(base_path))
+                continue
+
+            elapsed = time.time() - started
+            self.set_state(job, 'done', transcribe_seconds=round(elapsed, 2),
+                           rtf=round(elapsed / audio_seconds, 4) if audio_seconds else None)
+            # Per-stage timings of this book; dropped afterwards so the service does not accumulate them
+            book = os.path.basename(base_path)
+            metrics.write_book_metrics(book, os.path.dirname(wav_path))
+            metrics.recorder.forget(book)
+            print(f"Job {job['id']} done: {audio_seconds / 60:.1f} min of audio in {elapsed / 60:.1f} min")
+
+    def run(self):
+        """Load the model once, start both pipeline stages and poll for jobs until interrupted."""
+        if self.workers <= 1:
+            self.model = transcribe.load_whisper_model(self.model_name, self.threads, self.quantize)
+            if self.model is None:
+                return
+        else:
+            self.pool = transcribe.create_chunk_pool(self.model_name, self.language, self.workers, self.vad,
+                                                     self.batch_size, self.threads, self.quantize)
+
+        os.makedirs(self.queue_folder, exist_ok=True)
+        threads = [threading.Thread(target=self.convert_loop, name="convert"),
+                   threading.Thread(target=self.transcribe_loop, name="transcribe")]
+        for thread in threads:
+            thread.start()
+        print(f"Service running (pid {os.getpid()}); watching {self.input_folder} and {self.queue_folder}")
+
+        try:
+            while True:
+                self.scan_input()
+                self.scan_queue()
+                time.sleep(POLL_INTERVAL)
+        except KeyboardInterrupt:
+            print("Stopping service after the current job...")
+        finally:
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
+            if self.pool is not None:
+                self.pool.shutdown()
+            self.write_status()
+
+def submit_files(paths, queue_folder=QUEUE_FOLDER):
+    """Drop job files for a running service into the queue folder."""
+    os.makedirs(queue_folder, exist_ok=True)
+    for path in paths:
+        path = os.path.abspath(path)
+        if not os.path.isfile(path):
+            print(f"Not a file: {path}, skipping...")
+            continue
+        job_path = os.path.join(queue_folder, f"{time.time():.6f}-{os.path.basename(path)}.json")
+        transcribe.write_json_atomic({'path': path}, job_path)
+        print(f"Submitted: {path}")
+
+def print_status(output_folder):
+    """Print the status file written by a running (or finished) service."""
+    status = transcribe.load_json_file(os.path.join(output_folder, STATUS_FILENAME), None)
+    if status is None:
+        print("No service status found.")
+        return
+
+    print(f"Service pid {status['pid']}, model {status['model']}, "
+          f"last update {time.strftime('%H:%M:%S', time.localtime(status['updated']))}")
+    print(f"Done: {status['jobs_done']}  Failed: {status['jobs_failed']}  Waiting: {status['jobs_waiting']}")
+    print(f"Audio transcribed: {status['audio_hours_done']} h  "
+          f"RTF: {status['real_time_factor']}  Throughput: {status['audio_hours_per_hour']} audio h/h")
+    for job in status['jobs']:
+        print(f"  [{job['id']}] {job['state']:<12} {os.path.basename(job['input'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident AudibleHighlights transcription service.")
+    parser.add_argument('command', nargs='?', default='run', choices=['run', 'submit', 'status'])
+    parser.add_argument('paths', nargs='*', help="audio files to submit")
+    parser.add_argument('--model', default=transcribe.model_name)
+    parser.add_argument('--language', default=transcribe.language)
+    parser.add_argument('--workers', type=int, default=transcribe.num_workers)
+    parser.add_argument('--batch-size', type=int, default=transcribe.batch_size,
+                        help="Windows decoded together in one batched pass (see batch_decode.py)")
+    parser.add_argument('--threads', type=int, default=transcribe.torch_threads, help="Torch threads per model")
+    parser.add_argument('--vad', action='store_true', default=transcribe.vad_filter,
+                        help="Cut silences out before inference (see vad.py)")
+    parser.add_argument('--quantize', action='store_true', default=transcribe.quantize_int8,
+                        help="Run the model's linear layers in int8 on the CPU (see quantize.py)")
+    args = parser.parse_args()
+
+    input_folder, output_folder = transcribe.setup_project_folders(transcribe.project_folder)
+    if args.command == 'submit':
+        submit_files(args.paths)
+    elif args.command == 'status':
+        print_status(output_folder)
+    else:
+        service = TranscriptionService(input_folder, output_folder, QUEUE_FOLDER, args.model, args.language,
+                                       workers=args.workers, chunk_seconds=transcribe.chunk_seconds,
+                                       vad=args.vad, batch_size=args.batch_size, threads=args.threads,
+                                       quantize=args.quantize)
+        service.run()
+
+if __name__ == "__main__":
+    main()
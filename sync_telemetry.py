@@ -0,0 +1,123 @@
+"""Optional telemetry for the display's sync loop.
+
+When enabled (python display.py --telemetry), every update of the sync loop
+records:
+
+    tick_ms          how long the update took on the Tk thread
+    highlight_ms     how long moving the highlight took
+    latency_ms       how late a new word was highlighted: from the moment
+                     playback (after the delay offset) reached the word's
+                     start to the moment the highlight was moved, plus the
+                     time until Tk was idle again (i.e. had redrawn)
+    drift_ms         how far VLC's own time (after the delay offset) lies
+                     outside the highlighted word; 0 while it is inside
+    clock_error_ms   interpolated clock minus VLC's time
+
+Each is kept as a histogram with fixed buckets, so memory does not grow
+with the session. A summary can be shown in an overlay label and is printed
+and written to JSON when the window closes.
+"""
+import bisect
+import json
+import time
+
+# Upper bucket edges in milliseconds; the last bucket holds everything larger
+BUCKET_EDGES_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+class Histogram:
+    """Counts of values in fixed millisecond buckets, with count, sum and maximum."""
+
+    def __init__(self, edges=BUCKET_EDGES_MS):
+        self.edges = edges
+        self.counts = [0] * (len(edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction):
+        """Upper edge of the bucket holding the given fraction of the values, capped at the maximum."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self.edges[i], round(self.max, 3)) if i < len(self.edges) else round(self.max, 3)
+        return round(self.max, 3)
+
+    def to_dict(self):
+        buckets = {f"<={edge}": count for edge, count in zip(self.edges, self.counts)}
+        buckets[f">{self.edges[-1]}"] = self.counts[-1]
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else None,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+            'max': round(self.max, 3),
+            'buckets': buckets,
+        }
+
+class SyncTelemetry:
+    """Histograms of the sync loop's timings, see the module docstring."""
+
+    def __init__(self):
+        self.histograms = {name: Histogram() for name in
+                           ('tick_ms', 'highlight_ms', 'latency_ms', 'drift_ms', 'clock_error_ms')}
+        self.started = time.time()
+
+    def record(self, name, value):
+        self.histograms[name].add(abs(value))
+
+    def word_rendered(self, widget, late_ms, highlight_ms):
+        """Record a new word's highlight; the time until Tk is idle again is added once it is."""
+        self.record('highlight_ms', highlight_ms)
+        rendered = time.perf_counter()
+        widget.after_idle(lambda: self.record('latency_ms', late_ms + (time.perf_counter() - rendered) * 1000.0))
+
+    def drift(self, word_data, word_index, player_time):
+        """Record how far player_time (seconds, after the delay offset) is outside word word_index."""
+        start = float(word_data.starts[word_index])
+        end = word_data.next_change(word_index)
+        if player_time < start:
+            self.record('drift_ms', (start - player_time) * 1000.0)
+        elif player_time >= end:
+            self.record('drift_ms', (player_time - end) * 1000.0)
+        else:
+            self.record('drift_ms', 0.0)
+
+    def overlay_text(self):
+        """One-line summary for the overlay label."""
+        parts = []
+        for name in ('tick_ms', 'latency_ms', 'drift_ms'):
+            histogram = self.histograms[name]
+            if histogram.count:
+                parts.append(f"{name[:-3]} p50 {histogram.percentile(0.5)} / p95 {histogram.percentile(0.95)} ms")
+        return "  |  ".join(parts) or "Collecting sync telemetry..."
+
+    def to_dict(self):
+        return {
+            'started': self.started,
+            'seconds': round(time.time() - self.started, 1),
+            'histograms': {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+        }
+
+    def dump(self, path):
+        """Print the summary and write the histograms to path as JSON."""
+        summary = self.to_dict()
+        for name, histogram in summary['histograms'].items():
+            print(f"{name:<15} n={histogram['count']:<7} mean={histogram['mean']} p50={histogram['p50']} "
+                  f"p95={histogram['p95']} p99={histogram['p99']} max={histogram['max']}")
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2)
+            print(f"Sync telemetry written: {path}")
+        except Exception as e:
+            print(f"Error writing sync telemetry: {e}")
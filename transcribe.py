@@ -1,29 +1,236 @@
 import os
 import subprocess
-from pydub import AudioSegment
+
+import metrics
+from common import SAMPLE_RATE, SEEK_FRAMES_PER_SECOND, atomic_open, write_json_atomic
+from transcript_index import write_word_index
+from book_parts import (PARTS_FOLDER, build_parts_index, list_parts, load_parts_index, parts_index_path,
+                        write_parts_index)
+from align import BOOK_TEXT_EXTENSIONS, align_wav, find_book_text
+from batch_decode import WINDOW_SEARCH_SECONDS, WINDOW_SECONDS, transcribe_windows
+from cascade import CONFIDENCE_THRESHOLD, refine_result
+from media_info import MEDIA_INFO_SUFFIX
+from quantize import ensure_quantized_model, load_quantized_model
+from result_cache import (RESULT_CACHE_FOLDER, ResultCache, record_result_key, result_key, saved_result_key,
+                          wav_fingerprint)
+from vad import remove_silence, restore_timestamps
+from word_table import WordTable
+
+# List of file extensions to process with ffmpeg
+FFMPEG_EXTENSIONS = (".mp4", ".m4b", ".m4a", ".aac", ".ogg", ".flac", ".wav", ".wma", ".webm")
+MP3_EXTENSIONS = (".mp3",)
+
+# Records which input each converted WAV came from, see convert_audio
+MANIFEST_FILENAME = ".conversions.json"
 
 def convert_mp3_to_wav(input_path, output_path, bitrate="16k"):
-    try:
-        audio = AudioSegment.from_mp3(input_path)
-        audio = audio.set_frame_rate(16000).set_channels(1)
-        audio.export(output_path, format="wav", bitrate=bitrate)
-        print(f"Converted: {input_path} -> {output_path}")
-    except Exception as e:
-        print(f"Error converting {input_path} to WAV: {e}")
+    # MP3s are streamed through ffmpeg as well, so memory use stays bounded for
+    # long books; bitrate is kept for compatibility but has no effect on PCM WAV
+    return convert_ffmpeg_to_wav(input_path, output_path)
 
 def convert_ffmpeg_to_wav(input_path, output_path):
+    # Write to a temporary name first, so an interrupted conversion never
+    # leaves a truncated WAV behind under the final name
+    partial_path = f"{output_path}.part"
+    book = os.path.splitext(os.path.basename(output_path))[0]
+    with metrics.measure("convert", book) as stage:
+        try:
+            subprocess.run([
+                "ffmpeg", "-nostdin", "-y", "-loglevel", "error", "-i", input_path,
+                "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "wav", partial_path
+            ], check=True)
+            os.replace(partial_path, output_path)
+            stage.audio_seconds = wav_duration(output_path)
+            print(f"Converted: {input_path} -> {output_path}")
+            return True
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Error converting {input_path} to WAV. Error: {e}")
+            stage.failed = True
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            return False
+
+def file_sha256(path, block_size=1 << 20):
+    """Return the SHA-256 hex digest of a file, read in bounded blocks."""
+    import hashlib
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_json_file(path, default):
+    """Load a JSON file, returning default when it is missing or unreadable."""
+    import json
+
     try:
-        subprocess.run([
-            "ffmpeg", "-i", input_path, "-ac", "1", "-ar", "16000", output_path
-        ], check=True)
-        print(f"Converted: {input_path} -> {output_path}")
-    except subprocess.CalledProcessError as e:
-        print(f"Error converting {input_path} to WAV. Error: {e}")
-
-def convert_audio(input_folder, output_folder, bitrate="16k"):
-    # List of file extensions to process with ffmpeg
-    ffmpeg_extensions = (".mp4", ".m4b", ".m4a", ".aac", ".ogg", ".flac", ".wav", ".wma", ".webm")
-    pydub_extensions = (".mp3",)
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def is_complete_wav(path):
+    """Check that a WAV file's header agrees with its size, which a crashed writer leaves wrong."""
+    import wave
+
+    try:
+        with wave.open(path, 'rb') as wav:
+            data_bytes = wav.getnframes() * wav.getnchannels() * wav.getsampwidth()
+            return wav.getnframes() > 0 and os.path.getsize(path) >= data_bytes + 44
+    except (OSError, EOFError, wave.Error):
+        return False
+
+def conversion_is_current(entry, input_path, output_path):
+    """Return whether a manifest entry proves output_path is a complete conversion of input_path.
+
+    Size and mtime are checked first; the content hash is only computed when
+    they differ, so touching or copying a file does not force a new conversion.
+    When the hash matches, the entry takes the file's new mtime, so the file is
+    not hashed again on the next run once the manifest is saved.
+    """
+    if not entry or not os.path.exists(output_path):
+        return False
+    if os.path.getsize(output_path) != entry.get('output_size'):
+        return False
+    stat = os.stat(input_path)
+    if stat.st_size == entry.get('size') and stat.st_mtime == entry.get('mtime'):
+        return True
+    if stat.st_size != entry.get('size'):
+        return False
+    if file_sha256(input_path) != entry.get('sha256'):
+        return False
+    entry['mtime'] = stat.st_mtime
+    return True
+
+def manifest_entry(input_path, output_path):
+    """Describe a finished conversion for the manifest."""
+    stat = os.stat(input_path)
+    return {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'sha256': file_sha256(input_path),
+        'output': os.path.basename(output_path),
+        'output_size': os.path.getsize(output_path),
+    }
+
+def convert_file(input_path, output_path, bitrate="16k"):
+    """Convert one file (possibly in a worker process); returns its manifest entry or None on failure."""
+    _, ext = os.path.splitext(input_path)
+    if ext.lower() in MP3_EXTENSIONS:
+        converted = convert_mp3_to_wav(input_path, output_path, bitrate)
+    else:
+        converted = convert_ffmpeg_to_wav(input_path, output_path)
+    return manifest_entry(input_path, output_path) if converted else None
+
+def _convert_file_job(input_path, output_path, bitrate="16k"):
+    """convert_file for a worker process: also returns the metrics it recorded there."""
+    return convert_file(input_path, output_path, bitrate), metrics.recorder.take()
+
+def plan_conversion(input_path, output_folder, manifest):
+    """Work out where input_path is converted to and whether that still has to happen.
+
+    Returns (output_wav_path, needs_conversion); output_wav_path is None when the
+    file cannot be converted. Existing complete WAVs from before the manifest
+    existed are recorded in the manifest instead of being converted again.
+    """
+    filename = os.path.basename(input_path)
+
+    # Get the file extension
+    folder_name, ext = os.path.splitext(filename)
+    if ext.lower() in BOOK_TEXT_EXTENSIONS:
+        # The text of a book, used for alignment (see align.py)
+        return None, False
+    if filename.endswith(MEDIA_INFO_SUFFIX):
+        # Player cache left in the input folder by older versions (see media_info.py)
+        return None, False
+    if ext.lower() not in FFMPEG_EXTENSIONS + MP3_EXTENSIONS:
+        print(f"Unsupported file format: {filename}, skipping...")
+        return None, False
+
+    # Determine the output directory name (input filename without extension)
+    output_dir = os.path.join(output_folder, folder_name)
+
+    # Create the output directory if it doesn't exist
+    if not os.path.exists(output_dir):
+        try:
+            os.makedirs(output_dir)
+            print(f"Created directory: {output_dir}")
+        except Exception as e:
+            print(f"Error creating directory {output_dir}: {e}")
+            return None, False
+
+    # Define the output WAV file path inside the newly created directory
+    output_wav_path = os.path.join(output_dir, f"{folder_name}.wav")
+    return output_wav_path, needs_conversion(filename, input_path, output_wav_path, manifest)
+
+def needs_conversion(key, input_path, output_wav_path, manifest):
+    """Check the manifest entry under key to decide whether input_path must be converted again."""
+    entry = manifest.get(key)
+    if conversion_is_current(entry, input_path, output_wav_path):
+        print(f"WAV file already exists: {output_wav_path}, skipping...")
+        return False
+    if entry is None and is_complete_wav(output_wav_path):
+        # Converted before the manifest existed; adopt it rather than redo it
+        manifest[key] = manifest_entry(input_path, output_wav_path)
+        print(f"WAV file already exists: {output_wav_path}, skipping...")
+        return False
+    if os.path.exists(output_wav_path):
+        print(f"WAV file is stale or incomplete: {output_wav_path}, converting again...")
+    return True
+
+def plan_book_parts(book_path, output_folder, manifest):
+    """Plan the conversion of a folder holding the parts of one book (see book_parts.py).
+
+    Each part goes to output/<book>/parts/<part>.wav and is recorded in the
+    manifest as "<book>/<part file>". Returns (book_output_dir, parts), where
+    parts lists (key, input_path, output_wav_path, needs_conversion) in order.
+    """
+    book = os.path.basename(os.path.normpath(book_path))
+    book_output_dir = os.path.join(output_folder, book)
+    try:
+        names = list_parts(book_path, FFMPEG_EXTENSIONS + MP3_EXTENSIONS)
+        os.makedirs(os.path.join(book_output_dir, PARTS_FOLDER), exist_ok=True)
+    except Exception as e:
+        print(f"Error reading the parts of {book_path}: {e}")
+        return book_output_dir, []
+
+    parts = []
+    for name in names:
+        input_path = os.path.join(book_path, name)
+        output_wav_path = os.path.join(book_output_dir, PARTS_FOLDER, f"{os.path.splitext(name)[0]}.wav")
+        key = f"{book}/{name}"
+        parts.append((key, input_path, output_wav_path,
+                      needs_conversion(key, input_path, output_wav_path, manifest)))
+    return book_output_dir, parts
+
+def update_parts_index(book_output_dir, parts, manifest):
+    """Write the offset index of a book's parts once every part has been converted."""
+    if any(key not in manifest or not is_complete_wav(output_wav_path) for key, _, output_wav_path, _ in parts):
+        print(f"Not every part of {book_output_dir} was converted, its parts index is not written")
+        return
+    book = os.path.basename(os.path.normpath(book_output_dir))
+    index = build_parts_index(book, [
+        (os.path.splitext(os.path.basename(input_path))[0], input_path,
+         os.path.relpath(output_wav_path, book_output_dir), wav_duration(output_wav_path))
+        for _, input_path, output_wav_path, _ in parts
+    ])
+    path = parts_index_path(book_output_dir)
+    if load_parts_index(path) != index:
+        write_parts_index(index, path)
+        print(f"Parts index written: {path} ({len(parts)} parts, {index['duration'] / 3600:.1f} h)")
+
+def convert_audio(input_folder, output_folder, bitrate="16k", workers=1):
+    """Convert every audio file in input_folder to a 16 kHz mono WAV in output_folder.
+
+    Conversions run in a pool of worker processes, each streaming through
+    ffmpeg with bounded memory. A manifest in output_folder records the size,
+    mtime and hash of each input, so changed inputs are converted again and WAVs
+    left half-written by a crash are redone instead of skipped. A folder is a
+    book made of several files, whose parts are converted side by side and
+    indexed in <book>.parts.json (see book_parts.py).
+    """
+    from concurrent.futures import ProcessPoolExecutor
 
     # List all files directly inside the input_folder (no subdirectories)
     try:
@@ -32,58 +239,595 @@ def convert_audio(input_folder, output_folder, bitrate="16k"):
         print(f"Error accessing input folder: {e}")
         return
 
+    manifest_path = os.path.join(output_folder, MANIFEST_FILENAME)
+    manifest = load_json_file(manifest_path, {})
+    jobs = []
+    part_books = []
+
     for filename in files:
         input_path = os.path.join(input_folder, filename)
 
-        # Skip directories; process only files
+        # A directory holds the parts of one book
         if os.path.isdir(input_path):
-            print(f"Skipping directory: {input_path}")
+            book_output_dir, parts = plan_book_parts(input_path, output_folder, manifest)
+            if parts:
+                part_books.append((book_output_dir, parts))
+                jobs.extend((key, part_input, part_output) for key, part_input, part_output, needed in parts if needed)
             continue
 
-        # Get the file extension
-        _, ext = os.path.splitext(filename)
-        ext = ext.lower()
+        output_wav_path, needs_conversion = plan_conversion(input_path, output_folder, manifest)
+        if needs_conversion:
+            jobs.append((filename, input_path, output_wav_path))
 
-        # Determine the output directory name (input filename without extension)
-        folder_name = os.path.splitext(filename)[0]
-        output_dir = os.path.join(output_folder, folder_name)
+    with metrics.measure("convert_audio") as stage, ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [(filename, pool.submit(_convert_file_job, input_path, output_wav_path, bitrate))
+                   for filename, input_path, output_wav_path in jobs]
+        stage.audio_seconds = 0.0
+        for filename, future in futures:
+            entry, records = future.result()
+            metrics.recorder.add(records)
+            stage.audio_seconds += sum(record['audio_seconds'] or 0 for record in records)
+            if entry is not None:
+                manifest[filename] = entry
+                # Save after every file, so finished conversions survive a crash
+                write_json_atomic(manifest, manifest_path)
+    write_json_atomic(manifest, manifest_path)
 
-        # Create the output directory if it doesn't exist
-        if not os.path.exists(output_dir):
-            try:
-                os.makedirs(output_dir)
-                print(f"Created directory: {output_dir}")
-            except Exception as e:
-                print(f"Error creating directory {output_dir}: {e}")
-                continue
+    for book_output_dir, parts in part_books:
+        update_parts_index(book_output_dir, parts, manifest)
 
-        # Define the output WAV file path inside the newly created directory
-        output_wav_path = os.path.join(output_dir, f"{folder_name}.wav")
-
-        # Check if the WAV file already exists to avoid redundant conversions
-        if not os.path.exists(output_wav_path):
-            if ext in pydub_extensions:
-                convert_mp3_to_wav(input_path, output_wav_path, bitrate)
-            elif ext in ffmpeg_extensions:
-                convert_ffmpeg_to_wav(input_path, output_wav_path)
-            else:
-                print(f"Unsupported file format: {filename}, skipping...")
-        else:
-            print(f"WAV file already exists: {output_wav_path}, skipping...")
+def read_wav_blocks(wav_path, block_seconds=10, start_sample=0):
+    """Yield the samples of a 16 kHz mono 16-bit WAV file as int16 blocks, from start_sample on."""
+    import wave
+    import numpy as np
 
-def transcribe_wav_files(output_folder, model_name='base', language='en'):
+    with wave.open(wav_path, 'rb') as wav:
+        if wav.getnchannels() != 1 or wav.getsampwidth() != 2 or wav.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"{wav_path} is not a {SAMPLE_RATE} Hz mono 16-bit WAV file")
+        if start_sample:
+            wav.setpos(start_sample)
+        block_frames = int(block_seconds * SAMPLE_RATE)
+        while True:
+            data = wav.readframes(block_frames)
+            if not data:
+                break
+            yield np.frombuffer(data, dtype=np.int16)
+
+def read_wav_span(wav_path, start, end):
+    """Return the int16 samples of a WAV file between start and end seconds."""
+    import numpy as np
+
+    start_sample = int(start * SAMPLE_RATE)
+    wanted = int(end * SAMPLE_RATE) - start_sample
+    blocks, count = [], 0
+    for block in read_wav_blocks(wav_path, start_sample=start_sample):
+        blocks.append(block[:wanted - count])
+        count += len(blocks[-1])
+        if count >= wanted:
+            break
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.int16)
+
+def wav_duration(wav_path):
+    """Return the length of a WAV file in seconds, or 0 if it cannot be read."""
+    import wave
+
+    try:
+        with wave.open(wav_path, 'rb') as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (OSError, EOFError, wave.Error):
+        return 0
+
+def read_ffmpeg_blocks(input_path, block_seconds=10, keep_wav_path=None):
+    """Decode any audio file with ffmpeg and yield 16 kHz mono int16 blocks as they arrive.
+
+    Nothing is written to disk unless keep_wav_path is given, in which case the
+    decoded samples are also saved there as a WAV file while they stream past.
+    The WAV only appears under its final name once decoding has finished.
+    """
+    import wave
+    import numpy as np
+
+    process = subprocess.Popen([
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", input_path,
+        "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"
+    ], stdout=subprocess.PIPE)
+    wav = None
+    partial_wav_path = f"{keep_wav_path}.part" if keep_wav_path else None
+    try:
+        if keep_wav_path:
+            wav = wave.open(partial_wav_path, 'wb')
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(SAMPLE_RATE)
+
+        block_bytes = int(block_seconds * SAMPLE_RATE) * 2
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            if wav is not None:
+                wav.writeframes(data)
+            yield np.frombuffer(data[:len(data) - len(data) % 2], dtype=np.int16)
+
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, "ffmpeg")
+        if wav is not None:
+            wav.close()
+            wav = None
+            os.replace(partial_wav_path, keep_wav_path)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        if wav is not None:
+            wav.close()
+            os.remove(partial_wav_path)
+
+def _quietest_point(samples, start, end, frame_size):
+    """Return the sample index at the centre of the lowest-energy frame in samples[start:end]."""
+    import numpy as np
+
+    region = samples[start:end].astype(np.float32)
+    frame_count = max(1, len(region) // frame_size)
+    frames = region[:frame_count * frame_size].reshape(frame_count, -1)
+    quietest = int(np.argmin((frames ** 2).mean(axis=1)))
+    return start + quietest * frames.shape[1] + frames.shape[1] // 2
+
+def split_at_silence(blocks, chunk_seconds=600, search_seconds=30, start_sample=0):
+    """Regroup a stream of int16 sample blocks into chunks of about chunk_seconds.
+
+    Each cut is placed at the quietest 100 ms frame within search_seconds of the
+    target length, so words are not split between chunks. Yields
+    (offset_seconds, samples) tuples, where offset_seconds is the chunk start.
+
+    A cut only depends on the audio after the previous cut, so a stream resumed
+    at a chunk boundary (start_sample) is split exactly like the full stream.
+    """
+    import numpy as np
+
+    target = int(chunk_seconds * SAMPLE_RATE)
+    search = int(search_seconds * SAMPLE_RATE)
+    frame_size = SAMPLE_RATE // 10
+    pending = []
+    pending_length = 0
+    offset = start_sample
+
+    for block in blocks:
+        pending.append(block)
+        pending_length += len(block)
+        if pending_length < target + search:
+            continue
+
+        buffer = np.concatenate(pending)
+        while len(buffer) >= target + search:
+            cut = _quietest_point(buffer, target - search, target + search, frame_size)
+            yield offset / SAMPLE_RATE, buffer[:cut]
+            buffer = buffer[cut:]
+            offset += cut
+        pending = [buffer.copy()]
+        pending_length = len(buffer)
+
+    if pending_length:
+        yield offset / SAMPLE_RATE, np.concatenate(pending)
+
+def shift_result(result, offset):
+    """Shift every segment and word timestamp of a whisper result by offset seconds."""
+    for segment in result.get('segments', []):
+        segment['start'] = round(segment['start'] + offset, 2)
+        segment['end'] = round(segment['end'] + offset, 2)
+        if 'seek' in segment:
+            segment['seek'] += int(round(offset * SEEK_FRAMES_PER_SECOND))
+        for word in segment.get('words', []):
+            word['start'] = round(word['start'] + offset, 2)
+            word['end'] = round(word['end'] + offset, 2)
+    return result
+
+def merge_results(results):
+    """Merge whisper results of consecutive chunks (already shifted) into one result."""
+    merged = {'text': '', 'segments': [], 'language': None}
+    for result in results:
+        merged['text'] += result.get('text', '')
+        if merged['language'] is None:
+            merged['language'] = result.get('language')
+        for segment in result.get('segments', []):
+            segment['id'] = len(merged['segments'])
+            merged['segments'].append(segment)
+    return merged
+
+def save_transcription(result, txt_output_path, json_output_path):
+    """Write the plain text and the detailed JSON of a transcription result."""
+    # Save the transcription to a text file
+    with atomic_open(txt_output_path, 'w', encoding='utf-8') as f:
+        f.write(result['text'])
+
+    # Save the detailed result to a JSON file
+    write_json_atomic(result, json_output_path)
+
+    # Save the compact word index the player memory-maps for a fast start
+    try:
+        write_word_index(WordTable.from_result(result), json_output_path)
+    except Exception as e:
+        print(f"Error writing word index for {json_output_path}: {e}")
+
+def transcribe_samples(model, samples, language, vad=False, batch_size=1):
+    """Transcribe int16 samples with a loaded model; with vad, only their speech regions.
+
+    With vad, silences and pauses found by vad.py are cut out before inference
+    and the timestamps are mapped back, so the result is on the timeline of samples.
+    With batch_size above 1, the samples are cut into windows of under 30 s that
+    are decoded batch_size at a time (see batch_decode.py).
+    """
+    import whisper_timestamped as whisper
+    import numpy as np
+
+    timeline = None
+    if vad:
+        samples, timeline = remove_silence(samples, SAMPLE_RATE)
+        if not len(samples):
+            return {'text': '', 'segments': [], 'language': language}
+    if batch_size > 1:
+        windows = split_at_silence([samples], chunk_seconds=WINDOW_SECONDS, search_seconds=WINDOW_SEARCH_SECONDS)
+        result = transcribe_windows(model, windows, language, batch_size)
+    else:
+        audio = samples.astype(np.float32) / 32768.0
+        result = whisper.transcribe(model, audio, language=language)
+    return restore_timestamps(result, timeline) if timeline else result
+
+# Per-process state of the chunk transcription workers
+_worker_model = None
+_worker_language = None
+_worker_vad = False
+_worker_batch_size = 1
+
+def _init_chunk_worker(model_name, language, threads, vad=False, batch_size=1, quantize=False):
+    """Load the Whisper model once in each worker process."""
+    global _worker_model, _worker_language, _worker_vad, _worker_batch_size
+    import whisper_timestamped as whisper
+    import torch
+
+    torch.set_num_threads(threads)
+    if quantize:
+        _worker_model = load_quantized_model(model_name)
+    else:
+        _worker_model = whisper.load_model(model_name, device='cpu')
+    _worker_language = language
+    _worker_vad = vad
+    _worker_batch_size = batch_size
+
+def _transcribe_chunk(offset, samples):
+    """Transcribe one chunk in a worker process and shift it onto the book timeline."""
+    return shift_result(transcribe_samples(_worker_model, samples, _worker_language, _worker_vad,
+                                           _worker_batch_size), offset)
+
+def iter_transcribed_chunks(chunks, model, language, vad=False, batch_size=1):
+    """Transcribe (offset, samples) chunks one after another with an already loaded model.
+
+    Yields (offset, sample_count, result) for each chunk, in order.
+    """
+    for offset, samples in chunks:
+        yield offset, len(samples), shift_result(transcribe_samples(model, samples, language, vad, batch_size), offset)
+
+def transcribe_chunks(chunks, model, language, vad=False, batch_size=1):
+    """Transcribe (offset, samples) chunks with an already loaded model and merge them."""
+    return merge_results(result for _, _, result in
+                         iter_transcribed_chunks(chunks, model, language, vad, batch_size))
+
+def create_chunk_pool(model_name, language, workers, vad=False, batch_size=1, threads=None, quantize=False):
+    """Start a process pool whose workers each hold a loaded copy of the model.
+
+    Each worker gets threads torch threads, by default an equal share of the CPU
+    cores. With quantize, the workers load the int8 model (see quantize.py),
+    which is quantized and cached here first so they only have to load it.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if quantize:
+        ensure_quantized_model(model_name)
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_chunk_worker,
+                               initargs=(model_name, language, threads, vad, batch_size, quantize))
+
+def iter_transcribed_chunks_parallel(chunks, model_name, language, workers, pool=None, vad=False,
+                                     batch_size=1, quantize=False):
+    """Transcribe (offset, samples) chunks in a process pool, yielding them in order.
+
+    Yields (offset, sample_count, result) like iter_transcribed_chunks. At most
+    two chunks per worker are in flight, so memory stays bounded regardless of
+    the length of the book. Pass a pool from create_chunk_pool to keep the
+    workers (and their models) alive across books.
+    """
+    from collections import deque
+
+    owns_pool = pool is None
+    if owns_pool:
+        pool = create_chunk_pool(model_name, language, workers, vad, batch_size, quantize=quantize)
+    try:
+        in_flight = deque()
+        for offset, samples in chunks:
+            in_flight.append((offset, len(samples), pool.submit(_transcribe_chunk, offset, samples)))
+            if len(in_flight) >= 2 * workers:
+                offset, sample_count, future = in_flight.popleft()
+                yield offset, sample_count, future.result()
+        while in_flight:
+            offset, sample_count, future = in_flight.popleft()
+            yield offset, sample_count, future.result()
+    finally:
+        if owns_pool:
+            pool.shutdown(cancel_futures=True)
+
+def transcribe_chunks_parallel(chunks, model_name, language, workers, pool=None, vad=False, batch_size=1,
+                               quantize=False):
+    """Transcribe (offset, samples) chunks in a process pool and merge them in order."""
+    return merge_results(result for _, _, result in
+                         iter_transcribed_chunks_parallel(chunks, model_name, language, workers, pool, vad,
+                                                          batch_size, quantize))
+
+def load_whisper_model(model_name, threads=None, quantize=False):
+    """Load a Whisper model on the best available device, or return None on failure.
+
+    threads sets the number of torch threads used for CPU inference (torch's default if None).
+    With quantize, a CPU model has its linear layers quantized to int8 (see quantize.py).
+    """
     import whisper_timestamped as whisper
     import torch
-    import json
 
     # Check if the Whisper model exists; if not, download it
     try:
         device = 'cuda' if torch.cuda.is_available() else 'cpu'
         print(f"Using device: {device}")
-        model = whisper.load_model(model_name, device=device)
+        if threads:
+            torch.set_num_threads(threads)
+        if quantize and device == 'cpu':
+            with metrics.measure("model_load"):
+                return load_quantized_model(model_name)
+        if quantize:
+            print("int8 quantization only applies to CPU inference, loading the full-precision model")
+        with metrics.measure("model_load"):
+            return whisper.load_model(model_name, device=device)
     except Exception as e:
         print(f"Error loading Whisper model: {e}")
-        return
+        return None
+
+def quantization_applies(quantize):
+    """Whether int8 quantization is used with this setting; it only applies to CPU inference."""
+    import torch
+
+    return bool(quantize) and not torch.cuda.is_available()
+
+def refine_wav_result(result, wav_path, model, model_name, language, threshold=CONFIDENCE_THRESHOLD):
+    """Re-transcribe the low-confidence segments of a WAV file's result with a larger model (see cascade.py)."""
+    def transcribe_span(start, end):
+        return shift_result(transcribe_samples(model, read_wav_span(wav_path, start, end), language), start)
+
+    book = os.path.splitext(os.path.basename(wav_path))[0]
+    with metrics.measure("cascade", book) as stage:
+        result, stage.audio_seconds = refine_result(result, transcribe_span, model_name, threshold,
+                                                    duration=wav_duration(wav_path))
+    print(f"Re-transcribed {stage.audio_seconds:.0f}s of {book} with {model_name}")
+    return result
+
+def load_checkpoint(checkpoint_dir, wav_path, settings):
+    """Return the window results saved in checkpoint_dir and the sample to resume from.
+
+    The checkpoint is ignored when the WAV or the transcription settings changed.
+    """
+    state = load_json_file(os.path.join(checkpoint_dir, "state.json"), None)
+    stat = os.stat(wav_path)
+    if (state is None or state.get('wav_size') != stat.st_size
+            or state.get('wav_mtime') != stat.st_mtime or state.get('settings') != settings):
+        return [], 0
+
+    results = []
+    for window in state['windows']:
+        result = load_json_file(os.path.join(checkpoint_dir, window), None)
+        if result is None:
+            print(f"Checkpoint window {window} is unreadable, starting over")
+            return [], 0
+        results.append(result)
+    return results, state['next_sample']
+
+def transcribe_wav_windowed(wav_path, model=None, model_name='base', language='en', workers=1,
+                            chunk_seconds=600, pool=None, checkpoint_dir=None, vad=False, batch_size=1,
+                            quantize=False):
+    """Transcribe a WAV file window by window, saving progress to checkpoint_dir.
+
+    Each finished window is written atomically to its own file, followed by a
+    state file recording where the next window starts. A rerun after a crash
+    resumes from the last completed window; as windows are cut and decoded
+    deterministically, the merged result matches an uninterrupted run.
+    """
+    settings = {'model': model_name, 'language': language, 'chunk_seconds': chunk_seconds, 'vad': vad,
+                'batch_size': batch_size, 'quantize': quantize}
+    results, next_sample = [], 0
+    if checkpoint_dir:
+        results, next_sample = load_checkpoint(checkpoint_dir, wav_path, settings)
+        if next_sample:
+            print(f"Resuming {wav_path} at {next_sample / SAMPLE_RATE:.0f}s from {len(results)} saved windows")
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    chunks = split_at_silence(read_wav_blocks(wav_path, start_sample=next_sample),
+                              chunk_seconds=chunk_seconds, start_sample=next_sample)
+    if model is None:
+        # Transcribe the chunks across CPU cores
+        transcribed = iter_transcribed_chunks_parallel(chunks, model_name, language, workers, pool, vad, batch_size,
+                                                       quantize)
+    else:
+        transcribed = iter_transcribed_chunks(chunks, model, language, vad, batch_size)
+
+    stat = os.stat(wav_path)
+    for offset, sample_count, result in transcribed:
+        results.append(result)
+        if checkpoint_dir:
+            next_sample = int(round(offset * SAMPLE_RATE)) + sample_count
+            windows = [f"window_{index:05d}.json" for index in range(len(results))]
+            write_json_atomic(result, os.path.join(checkpoint_dir, windows[-1]), indent=None)
+            write_json_atomic({
+                'wav_size': stat.st_size,
+                'wav_mtime': stat.st_mtime,
+                'settings': settings,
+                'next_sample': next_sample,
+                'windows': windows,
+            }, os.path.join(checkpoint_dir, "state.json"))
+
+    return merge_results(results)
+
+def remove_checkpoint(checkpoint_dir):
+    """Delete a checkpoint once the final transcription has been saved."""
+    import shutil
+
+    if checkpoint_dir and os.path.isdir(checkpoint_dir):
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+def uses_windows(model, checkpoint_dir, vad, batch_size):
+    """Whether transcribe_wav decodes in windows (chunk_seconds long) rather than in one call."""
+    return model is None or bool(checkpoint_dir) or bool(vad) or batch_size > 1
+
+def transcribe_wav(wav_path, model=None, model_name='base', language='en', workers=1,
+                   chunk_seconds=600, pool=None, checkpoint_dir=None, vad=False, batch_size=1, quantize=False):
+    """Transcribe one WAV file, with the loaded model or, when model is None, across worker processes.
+
+    With a checkpoint_dir, with several workers, or with vad or batching (see
+    transcribe_samples), the book is transcribed in windows (see
+    transcribe_wav_windowed); otherwise in a single call.
+    """
+    import whisper_timestamped as whisper
+
+    book = os.path.splitext(os.path.basename(wav_path))[0]
+    with metrics.measure("transcribe", book, audio_seconds=wav_duration(wav_path)):
+        if uses_windows(model, checkpoint_dir, vad, batch_size):
+            return transcribe_wav_windowed(wav_path, model, model_name, language, workers,
+                                           chunk_seconds, pool, checkpoint_dir, vad, batch_size, quantize)
+
+        # Transcribe the audio file
+        return whisper.transcribe(
+            model,
+            wav_path,
+            language=language,
+            # Uncomment the following line if you want to use this option
+            # detect_disfluencies=True,
+        )
+
+def align_wav_file(wav_path, text_path, model, language='en'):
+    """Time the words of a book's known text against its WAV instead of transcribing it (see align.py)."""
+    book = os.path.splitext(os.path.basename(wav_path))[0]
+    with metrics.measure("align", book, audio_seconds=wav_duration(wav_path)):
+        return align_wav(model, wav_path, text_path, language)
+
+def transcribe_book_parts(book_dir, index, *, model=None, model_name='base', language='en', workers=1,
+                          chunk_seconds=600, vad=False, batch_size=1, quantize=False, refine_model=None,
+                          cascade_model=None, cascade_threshold=CONFIDENCE_THRESHOLD):
+    """Transcribe the parts of a multi-file book (see book_parts.py) and merge them onto the book's timeline.
+
+    Each part's transcription is saved to parts/<part>.json on the part's own
+    timeline, and parts whose transcription is newer than their WAV are not
+    transcribed again, so an interrupted book resumes at the part it was on.
+    The chunks of all remaining parts go through one stream, so with several
+    workers, different parts are transcribed at the same time.
+    """
+    from collections import deque
+
+    parts = index['parts']
+    part_json_paths = [os.path.join(book_dir, PARTS_FOLDER, f"{part['name']}.json") for part in parts]
+    wav_paths = [os.path.join(book_dir, part['wav']) for part in parts]
+    pending = [number for number, (json_path, wav_path) in enumerate(zip(part_json_paths, wav_paths))
+               if not os.path.exists(json_path) or os.path.getmtime(json_path) < os.path.getmtime(wav_path)]
+
+    # Part number of each chunk handed to the transcriber, in order; results come back in the same order
+    owners = deque()
+
+    def part_chunks():
+        for number in pending:
+            for chunk in split_at_silence(read_wav_blocks(wav_paths[number]), chunk_seconds=chunk_seconds):
+                owners.append(number)
+                yield chunk
+
+    def finish_part(number, results):
+        result = merge_results(results)
+        if refine_model is not None:
+            result = refine_wav_result(result, wav_paths[number], refine_model, cascade_model, language,
+                                       cascade_threshold)
+        write_json_atomic(result, part_json_paths[number])
+        print(f"Part {number + 1}/{len(parts)} transcribed: {parts[number]['name']}")
+
+    book = os.path.basename(os.path.normpath(book_dir))
+    with metrics.measure("transcribe", book, audio_seconds=index['duration']):
+        if model is None:
+            transcribed = iter_transcribed_chunks_parallel(part_chunks(), model_name, language, workers, vad=vad,
+                                                           batch_size=batch_size, quantize=quantize)
+        else:
+            transcribed = iter_transcribed_chunks(part_chunks(), model, language, vad, batch_size)
+
+        remaining = iter(pending)
+        current, results = next(remaining, None), []
+        for _, _, result in transcribed:
+            owner = owners.popleft()
+            # Parts before the owner of this chunk are complete (a part without audio has no chunks)
+            while current != owner:
+                finish_part(current, results)
+                current, results = next(remaining), []
+            results.append(result)
+        while current is not None:
+            finish_part(current, results)
+            current, results = next(remaining, None), []
+
+    return merge_results(shift_result(load_json_file(json_path, {'segments': []}), part['offset'])
+                         for part, json_path in zip(parts, part_json_paths))
+
+def _result_cache_key(wav_path, text_path, model_name, language, windowed, chunk_seconds, vad, batch_size,
+                      quantized, cascade_model, cascade_threshold):
+    """Result cache key of a book with these settings, or None if its WAV cannot be read.
+
+    Only settings that change the result are part of the key: chunk_seconds
+    only matters to the windowed path, and quantized is whether int8
+    quantization was actually used (see quantization_applies).
+    """
+    options = {
+        # An aligned book depends on its text rather than on decoding
+        'path': 'align' if text_path else 'windowed' if windowed else 'single',
+        'vad': vad,
+        'batch_size': batch_size,
+        'quantize': quantized,
+        'cascade_model': cascade_model,
+        'cascade_threshold': cascade_threshold if cascade_model else None,
+        'text_sha256': file_sha256(text_path) if text_path else None,
+    }
+    if windowed and not text_path:
+        options['chunk_seconds'] = chunk_seconds
+    try:
+        return result_key(wav_fingerprint(wav_path), model_name, language, options)
+    except Exception as e:
+        print(f"Error fingerprinting {wav_path}, not using the result cache: {e}")
+        return None
+
+def transcribe_wav_files(output_folder, model_name='base', language='en', workers=1, chunk_seconds=600,
+                         resumable=True, profile_book=None, vad=False, batch_size=1, threads=None,
+                         quantize=False, cascade_model=None, cascade_threshold=CONFIDENCE_THRESHOLD,
+                         text_folder=None, result_cache=None):
+    """Transcribe the WAV file of every book in output_folder that has no transcription yet.
+
+    Each book's metrics go to <book>.metrics.json; the book named profile_book
+    is also run under cProfile, with the stats saved to <book>.prof. With a
+    cascade_model, segments below cascade_threshold confidence are transcribed
+    again with that model (see cascade.py). Books with their text in
+    text_folder (<book>.epub or <book>.txt) are aligned to it instead.
+
+    With a result_cache (see result_cache.py), a book whose audio, model and
+    options match a cached result is restored from it, and a saved
+    transcription made with other settings is redone.
+    """
+    # With several workers, each worker process loads its own copy of the model
+    model = None
+    if workers <= 1:
+        model = load_whisper_model(model_name, threads, quantize)
+        if model is None:
+            return
+    refine_model = None
+    if cascade_model:
+        refine_model = load_whisper_model(cascade_model, threads, quantize)
+        if refine_model is None:
+            return
+    align_model = model  # Loaded when first needed if the workers hold the models
 
     # List all subdirectories inside the output_folder
     try:
@@ -96,40 +840,178 @@ def transcribe_wav_files(output_folder, model_name='base', language='en'):
         subdir_path = os.path.join(output_folder, subdir)
         files = sorted(os.listdir(subdir_path))
 
+        parts_path = parts_index_path(subdir_path)
+        if os.path.exists(parts_path):
+            # A book made of several files; merged again whenever its parts change
+            txt_output_path = os.path.join(subdir_path, f"{subdir}.txt")
+            json_output_path = os.path.join(subdir_path, f"{subdir}.json")
+            index = load_parts_index(parts_path)
+            if index is None:
+                print(f"Error reading parts index {parts_path}, skipping...")
+                continue
+            changed = max([os.path.getmtime(parts_path)] + [os.path.getmtime(os.path.join(subdir_path, part['wav']))
+                                                            for part in index['parts']])
+            if (os.path.exists(txt_output_path) and os.path.exists(json_output_path)
+                    and os.path.getmtime(json_output_path) >= changed):
+                print(f"Transcription already exists for: {parts_path}, skipping...")
+                continue
+            print(f"Transcribing the parts of {subdir}")
+            profile_path = os.path.join(subdir_path, f"{subdir}.prof") if subdir == profile_book else None
+            try:
+                with metrics.profile(profile_path):
+                    result = transcribe_book_parts(subdir_path, index, model=model, model_name=model_name,
+                                                   language=language, workers=workers,
+                                                   chunk_seconds=chunk_seconds, vad=vad, batch_size=batch_size,
+                                                   quantize=quantize, refine_model=refine_model,
+                                                   cascade_model=cascade_model,
+                                                   cascade_threshold=cascade_threshold)
+                save_transcription(result, txt_output_path, json_output_path)
+                print(f"Transcription created: {parts_path} -> {txt_output_path} & {json_output_path}")
+            except Exception as e:
+                print(f"Error transcribing the parts of {subdir}: {e}")
+            metrics.write_book_metrics(subdir, subdir_path)
+            continue
+
         for filename in files:
             if filename.endswith(".wav"):
                 wav_path = os.path.join(subdir_path, filename)
                 base_filename = os.path.splitext(filename)[0]
                 txt_output_path = os.path.join(subdir_path, f"{base_filename}.txt")
                 json_output_path = os.path.join(subdir_path, f"{base_filename}.json")
+                # Progress is saved here window by window, so an interrupted run can resume
+                checkpoint_dir = os.path.join(subdir_path, f"{base_filename}.checkpoint") if resumable else None
+                text_path = find_book_text(text_folder, base_filename) if text_folder else None
+                outputs_exist = os.path.exists(txt_output_path) and os.path.exists(json_output_path)
+
+                key = None
+                # Transcriptions saved before the cache existed are kept as they are
+                if result_cache is not None and not (outputs_exist and saved_result_key(wav_path) is None):
+                    key = _result_cache_key(wav_path, text_path, model_name, language,
+                                            uses_windows(model, checkpoint_dir, vad, batch_size), chunk_seconds,
+                                            vad, batch_size, quantization_applies(quantize), cascade_model,
+                                            cascade_threshold)
+                up_to_date = outputs_exist and (key is None or saved_result_key(wav_path) == key)
+                # The cache is only read for books that need a result, so skipping stays cheap
+                # and an up-to-date book does not count as a use of its cache entry
+                cached = result_cache.get(key) if key is not None and not up_to_date else None
 
                 # Check if transcription already exists
-                if not os.path.exists(txt_output_path) or not os.path.exists(json_output_path):
+                if up_to_date:
+                    print(f"Transcription already exists for: {wav_path}, skipping...")
+                elif cached is not None:
+                    save_transcription(cached, txt_output_path, json_output_path)
+                    record_result_key(wav_path, key)
+                    print(f"Transcription restored from the result cache: {txt_output_path} & {json_output_path}")
+                else:
                     print(f"Transcribing {filename} in {subdir_path}")
+                    profile_path = os.path.join(subdir_path, f"{base_filename}.prof") if base_filename == profile_book else None
                     try:
-                        # Transcribe the audio file
-                        result = whisper.transcribe(
-                            model,
-                            wav_path,
-                            language=language,
-                            # Uncomment the following lines if you want to use these options
-                            # vad=True,
-                            # detect_disfluencies=True,
-                        )
-
-                        # Save the transcription to a text file
-                        with open(txt_output_path, 'w', encoding='utf-8') as f:
-                            f.write(result['text'])
-
-                        # Save the detailed result to a JSON file
-                        with open(json_output_path, 'w', encoding='utf-8') as f:
-                            json.dump(result, f, indent=2, ensure_ascii=False)
+                        with metrics.profile(profile_path):
+                            if text_path:
+                                # The words are already known, so they only have to be timed
+                                print(f"Aligning {filename} to {text_path}")
+                                if align_model is None:
+                                    align_model = load_whisper_model(model_name, threads, quantize)
+                                    if align_model is None:
+                                        continue
+                                result = align_wav_file(wav_path, text_path, align_model, language)
+                            else:
+                                result = transcribe_wav(wav_path, model, model_name, language, workers,
+                                                        chunk_seconds, checkpoint_dir=checkpoint_dir, vad=vad,
+                                                        batch_size=batch_size, quantize=quantize)
+                            if refine_model is not None and not text_path:
+                                result = refine_wav_result(result, wav_path, refine_model, cascade_model,
+                                                           language, cascade_threshold)
+                        save_transcription(result, txt_output_path, json_output_path)
+                        remove_checkpoint(checkpoint_dir)
+                        if key is not None:
+                            result_cache.put(key, result)
+                            record_result_key(wav_path, key)
 
                         print(f"Transcription created: {wav_path} -> {txt_output_path} & {json_output_path}")
                     except Exception as e:
                         print(f"Error transcribing {wav_path}: {e}")
+                    metrics.write_book_metrics(base_filename, subdir_path)
+
+def _count_audio(chunks, stage):
+    """Pass chunks through, adding their length to stage.audio_seconds."""
+    stage.audio_seconds = 0.0
+    for offset, samples in chunks:
+        stage.audio_seconds += len(samples) / SAMPLE_RATE
+        yield offset, samples
+
+def stream_transcribe_audio(input_folder, output_folder, model_name='base', language='en',
+                            workers=1, chunk_seconds=600, keep_wav=False, profile_book=None, vad=False,
+                            batch_size=1, threads=None, quantize=False, cascade_model=None,
+                            cascade_threshold=CONFIDENCE_THRESHOLD):
+    """Transcribe the files in input_folder straight from ffmpeg's decoded output.
+
+    Unlike convert_audio followed by transcribe_wav_files, no intermediate WAV is
+    needed: decoded audio is cut into chunks as it streams in, so inference starts
+    as soon as the first chunk is ready. The WAV is only written when keep_wav is
+    set; the cascade (see transcribe_wav_files) re-reads it, so it needs keep_wav.
+    """
+    model = None
+    if workers <= 1:
+        model = load_whisper_model(model_name, threads, quantize)
+        if model is None:
+            return
+    refine_model = None
+    if cascade_model and keep_wav:
+        refine_model = load_whisper_model(cascade_model, threads, quantize)
+        if refine_model is None:
+            return
+    elif cascade_model:
+        print("The cascade re-reads the audio from the WAV file, set keep_wav to use it while streaming")
+
+    # List all files directly inside the input_folder (no subdirectories)
+    try:
+        files = sorted(os.listdir(input_folder))
+    except Exception as e:
+        print(f"Error accessing input folder: {e}")
+        return
+
+    for filename in files:
+        input_path = os.path.join(input_folder, filename)
+        folder_name, ext = os.path.splitext(filename)
+
+        if os.path.isdir(input_path):
+            print(f"Skipping directory: {input_path} (books made of several files need stream_audio = False)")
+            continue
+        if ext.lower() not in FFMPEG_EXTENSIONS + MP3_EXTENSIONS:
+            print(f"Unsupported file format: {filename}, skipping...")
+            continue
+
+        output_dir = os.path.join(output_folder, folder_name)
+        txt_output_path = os.path.join(output_dir, f"{folder_name}.txt")
+        json_output_path = os.path.join(output_dir, f"{folder_name}.json")
+        if os.path.exists(txt_output_path) and os.path.exists(json_output_path):
+            print(f"Transcription already exists for: {input_path}, skipping...")
+            continue
+
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            wav_path = os.path.join(output_dir, f"{folder_name}.wav") if keep_wav else None
+            print(f"Streaming and transcribing {input_path}")
+            profile_path = os.path.join(output_dir, f"{folder_name}.prof") if folder_name == profile_book else None
+            # Decoding and inference overlap here, so they are measured as one stage
+            with metrics.profile(profile_path), metrics.measure("stream_transcribe", folder_name) as stage:
+                chunks = _count_audio(split_at_silence(read_ffmpeg_blocks(input_path, keep_wav_path=wav_path),
+                                                       chunk_seconds=chunk_seconds), stage)
+                if model is None:
+                    result = transcribe_chunks_parallel(chunks, model_name, language, workers, vad=vad,
+                                                        batch_size=batch_size, quantize=quantize)
                 else:
-                    print(f"Transcription already exists for: {wav_path}, skipping...")
+                    result = transcribe_chunks(chunks, model, language, vad, batch_size)
+            if refine_model is not None:
+                result = refine_wav_result(result, wav_path, refine_model, cascade_model, language,
+                                           cascade_threshold)
+
+            save_transcription(result, txt_output_path, json_output_path)
+            print(f"Transcription created: {input_path} -> {txt_output_path} & {json_output_path}")
+        except Exception as e:
+            print(f"Error transcribing {input_path}: {e}")
+        metrics.write_book_metrics(folder_name, output_dir)
 
 # Get the current directory as the project folder
 project_folder = os.path.dirname(os.path.abspath(__file__))
@@ -149,15 +1031,88 @@ def setup_project_folders(project_folder):
 
     return input_folder, output_folder
 
-# Setup project folders and get paths
-input_folder, output_folder = setup_project_folders(project_folder)
+def main():
+    # Setup project folders and get paths
+    input_folder, output_folder = setup_project_folders(project_folder)
+
+    result_cache = None
+    if result_cache_mb:
+        result_cache = ResultCache(os.path.join(output_folder, RESULT_CACHE_FOLDER), result_cache_mb * 1024 * 1024)
+
+    if stream_audio:
+        # Decode and transcribe in one pass, without an intermediate WAV file
+        stream_transcribe_audio(input_folder, output_folder, model_name=model_name, language=language,
+                                workers=num_workers, chunk_seconds=chunk_seconds, keep_wav=keep_wav,
+                                profile_book=profile_book, vad=vad_filter, batch_size=batch_size,
+                                threads=torch_threads, quantize=quantize_int8, cascade_model=cascade_model,
+                                cascade_threshold=cascade_threshold)
+    else:
+        # Convert audio files to WAV format
+        convert_audio(input_folder, output_folder, workers=num_workers)
+
+        # Transcribe WAV files using whisper-timestamped
+        transcribe_wav_files(output_folder, model_name=model_name, language=language,
+                             workers=num_workers, chunk_seconds=chunk_seconds, resumable=resumable,
+                             profile_book=profile_book, vad=vad_filter, batch_size=batch_size,
+                             threads=torch_threads, quantize=quantize_int8, cascade_model=cascade_model,
+                             cascade_threshold=cascade_threshold, text_folder=input_folder if align_texts else None,
+                             result_cache=result_cache)
+
+    # Print per-stage timings and save them to output/run_metrics.json
+    metrics.write_run_summary(output_folder)
 
 # Choose the Whisper model you want to use: tiny, base, small, medium, large
 model_name = "tiny"  # You can change this to the desired model size
 language = "en"  # Set the language code (e.g., 'es' for Spanish)
 
-# Convert audio files to WAV format
-convert_audio(input_folder, output_folder)
+# Set num_workers above 1 to cut each book at silences and transcribe the
+# chunks in parallel, one process (and one copy of the model) per worker
+num_workers = 1
+chunk_seconds = 600  # Approximate length of each chunk in seconds
+
+# Set stream_audio to decode each book straight into the transcriber instead of
+# writing a full WAV file first; keep_wav also saves the decoded WAV alongside
+stream_audio = False
+keep_wav = False
+
+# Save progress after every chunk, so an interrupted transcription resumes where it stopped
+resumable = True
+
+# Set to True to cut silences, pauses and other non-speech out of each chunk before inference
+# (see vad.py); saves time on padded books and avoids words hallucinated into silence, but
+# changes the transcripts (and word timings around the cuts) compared with unfiltered runs
+vad_filter = False
+
+# Set batch_size above 1 to decode that many 30-second windows together in one
+# batched forward pass (see batch_decode.py), which makes better use of many
+# CPU cores than whisper's one window at a time; torch_threads sets the number
+# of threads for inference in this process (None keeps torch's default)
+batch_size = 1
+torch_threads = None
+
+# Quantize the model's linear layers to int8 for faster CPU inference (see
+# quantize.py); the quantized model is cached after the first run
+quantize_int8 = False
+
+# Set cascade_model to a larger model (e.g. "medium") to transcribe with model_name
+# first and re-transcribe only the segments whose mean word confidence is below
+# cascade_threshold with the larger model (see cascade.py)
+cascade_model = None
+cascade_threshold = CONFIDENCE_THRESHOLD
+
+# Books whose text sits next to their audio in the input folder (YourBook1.epub or
+# YourBook1.txt) are aligned to that text instead of transcribed (see align.py)
+align_texts = True
+
+# Keep finished transcriptions in output/.result_cache (up to this many MB; 0 turns
+# it off), keyed by the audio's samples, the model and the options above, so a
+# renamed or re-encoded book is restored instead of transcribed again, and a
+# book transcribed with other settings is transcribed again (see result_cache.py)
+result_cache_mb = 2048
+
+# Name of one book (e.g. "YourBook1") to run under cProfile; its stats are saved to <book>.prof
+profile_book = None
 
-# Transcribe WAV files using whisper-timestamped
-transcribe_wav_files(output_folder, model_name=model_name, language=language)
+# Worker processes re-import this module, so only run the pipeline when executed directly
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Compact binary word index written next to each transcription JSON.
+
+The whisper JSON carries every segment field and per-word confidences, and
+parsing it for a long book takes seconds and hundreds of MB. The index keeps
+only the columns of a WordTable, laid out so they can be memory-mapped:
+
+    header   magic, version, word count, text size and the size/mtime of
+             the JSON it was built from (to detect a stale index)
+    columns  start times and end times (float64), then character start and
+             end offsets into the transcript (uint32), one entry per word
+    text     the transcript as UTF-8, words joined by single spaces
+
+Build an index for existing transcripts with:
+    python transcript_index.py output/YourBook/YourBook.json
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from common import atomic_open
+from word_table import CHAR_DTYPE, TIME_DTYPE, WordTable
+
+WORD_INDEX_SUFFIX = ".words.bin"
+MAGIC = b"AHWI"
+VERSION = 1
+# magic, version, word count, text bytes, JSON size, JSON mtime (ns); padded to 64 bytes
+HEADER = struct.Struct("<4sIQQQq")
+HEADER_SIZE = 64
+
+def word_index_path(json_file_path):
+    """Return the path of the index that belongs to a transcription JSON."""
+    return os.path.splitext(json_file_path)[0] + WORD_INDEX_SUFFIX
+
+def write_word_index(table, json_file_path):
+    """Write the index of the WordTable built from json_file_path."""
+    text = table.text.encode('utf-8')
+    stat = os.stat(json_file_path)
+    header = HEADER.pack(MAGIC, VERSION, len(table), len(text), stat.st_size, stat.st_mtime_ns)
+    index_path = word_index_path(json_file_path)
+    with atomic_open(index_path, 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE, b'\0'))
+        f.write(np.asarray(table.starts, dtype=TIME_DTYPE).tobytes())
+        f.write(np.asarray(table.ends, dtype=TIME_DTYPE).tobytes())
+        f.write(np.asarray(table.char_starts, dtype=CHAR_DTYPE).tobytes())
+        f.write(np.asarray(table.char_ends, dtype=CHAR_DTYPE).tobytes())
+        f.write(text)
+    return index_path
+
+def load_word_index(json_file_path):
+    """Memory-map the index of a transcription as a WordTable.
+
+    Returns None if the index is missing, unreadable or older than the JSON.
+    The columns stay backed by the mapped file, so nothing is copied or parsed.
+    """
+    index_path = word_index_path(json_file_path)
+    if not os.path.exists(index_path):
+        return None
+    try:
+        with open(index_path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, text_bytes, source_size, source_mtime_ns = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not a version {VERSION} word index")
+
+        if os.path.exists(json_file_path):
+            stat = os.stat(json_file_path)
+            if stat.st_size != source_size or stat.st_mtime_ns != source_mtime_ns:
+                print(f"Word index {index_path} is older than {json_file_path}, ignoring it")
+                return None
+
+        columns = []
+        offset = HEADER_SIZE
+        for dtype in (TIME_DTYPE, TIME_DTYPE, CHAR_DTYPE, CHAR_DTYPE):
+            columns.append(np.frombuffer(mapped, dtype=dtype, count=count, offset=offset))
+            offset += count * dtype.itemsize
+        text = mapped[offset:offset + text_bytes].decode('utf-8')
+        return WordTable(*columns, text)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Error reading word index {index_path}: {e}")
+        return None
+
+def build_word_index(json_file_path):
+    """Build or refresh the index for an existing transcription JSON."""
+    with open(json_file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return write_word_index(WordTable.from_result(data), json_file_path)
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        try:
+            print(f"Word index created: {build_word_index(path)}")
+        except Exception as e:
+            print(f"Error building word index for {path}: {e}")
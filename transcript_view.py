@@ -0,0 +1,195 @@
+"""Windowed view of a transcript in a Tk Text widget.
+
+Only a bounded range of words around the playback position (at most
+MAX_BLOCKS blocks of BLOCK_WORDS words) is ever inserted into the widget.
+The range slides forward as playback advances, jumps on seeks, and grows at
+either end when the user scrolls to the top or bottom of what is loaded, with
+the far end trimmed so the widget never holds more than the limit. Memory use
+and the cost of resolving text indices therefore do not depend on the length
+of the book.
+
+Given a ChapterIndex, the window is further kept inside one chapter at a
+time: scrolling stops at the chapter's ends, and moving the highlight to a
+word of another chapter (playback crossing a chapter boundary, a seek, a
+search result) switches the view to that chapter first.
+
+Highlighting is incremental: marks remember the range tagged last time, so
+a word change only untags that range and tags the new word, and the view
+only scrolls when the new word is outside the visible area.
+"""
+from tkinter import DISABLED, NORMAL
+
+BLOCK_WORDS = 2000  # Words added or removed at a time
+MAX_BLOCKS = 3  # Most blocks held by the widget at once
+HIGHLIGHT_TAG = 'highlight'
+# Marks around the highlighted word; unlike stored indices they follow edits to the window
+HIGHLIGHT_START_MARK = 'highlight_start'
+HIGHLIGHT_END_MARK = 'highlight_end'
+
+class TranscriptView:
+    """Keeps a slice of a WordTable rendered in text_display, as one line of text."""
+
+    def __init__(self, text_display, word_data, block_words=BLOCK_WORDS, max_blocks=MAX_BLOCKS,
+                 highlight_color='cyan', chapters=None, on_chapter_change=None):
+        self.text_display = text_display
+        self.words = word_data
+        self.chapters = chapters  # ChapterIndex, or None to show the book as one range
+        self.on_chapter_change = on_chapter_change  # Called with the new chapter number on a switch
+        self.chapter = None  # Chapter shown, once one is
+        self.bound_first = 0  # The window stays within words bound_first..bound_last-1
+        self.bound_last = len(word_data)
+        self.block_words = block_words
+        self.max_words = block_words * max_blocks
+        self.first = 0  # First word in the widget
+        self.last = 0  # One past the last word in the widget
+        self.base_char = 0  # Book character offset of the widget's first character
+        self._load_pending = False
+        self.highlighted = None  # Index of the highlighted word
+        text_display.config(yscrollcommand=self._on_scroll)
+        text_display.tag_config(HIGHLIGHT_TAG, background=highlight_color)
+        text_display.mark_set(HIGHLIGHT_START_MARK, '1.0')
+        text_display.mark_set(HIGHLIGHT_END_MARK, '1.0')
+
+    def contains(self, index):
+        return self.first <= index < self.last
+
+    def _book_chars(self, first, last):
+        """Return the transcript text of words first..last-1, with the trailing space of each word."""
+        start = int(self.words.char_starts[first])
+        end = int(self.words.char_starts[last]) if last < len(self.words) else len(self.words.text)
+        return start, self.words.text[start:end]
+
+    def render(self, first, last):
+        """Replace the widget contents with words first..last-1."""
+        first = max(self.bound_first, first)
+        last = min(self.bound_last, last)
+        self.base_char, text = self._book_chars(first, last) if first < last else (0, '')
+        self.first, self.last = first, last
+        self.text_display.config(state=NORMAL)
+        self.text_display.delete('1.0', 'end')
+        self.text_display.insert('1.0', text)
+        self.text_display.config(state=DISABLED)
+
+    def render_around(self, index):
+        """Render a window of blocks centred on word index."""
+        first = max(self.bound_first, min(index, self.bound_last) - self.max_words // 2)
+        self.render(first, first + self.max_words)
+
+    def set_chapters(self, chapters, index):
+        """Switch to another ChapterIndex (chapters often arrive after the words), showing word index."""
+        self.chapters = chapters
+        self.chapter = None
+        self.show_chapter(chapters.chapter_of(index), index)
+
+    def show_chapter(self, chapter, index=None):
+        """Limit the window to chapter and render it around word index (the chapter's start by default)."""
+        self.bound_first, self.bound_last = self.chapters.word_range(chapter)
+        self.render_around(self.bound_first if index is None else index)
+        if chapter != self.chapter:
+            self.chapter = chapter
+            if self.on_chapter_change is not None:
+                self.on_chapter_change(chapter)
+
+    def append_block(self):
+        """Load the next block after the window, trimming the start of the window if needed."""
+        if self.last >= self.bound_last:
+            return
+        new_last = min(self.bound_last, self.last + self.block_words)
+        _, text = self._book_chars(self.last, new_last)
+        self.text_display.config(state=NORMAL)
+        self.text_display.insert('end-1c', text)
+        self.last = new_last
+        if self.last - self.first > self.max_words:
+            new_first = self.last - self.max_words
+            trimmed = int(self.words.char_starts[new_first]) - self.base_char
+            self.text_display.delete('1.0', f"1.{trimmed}")
+            self.first, self.base_char = new_first, self.base_char + trimmed
+        self.text_display.config(state=DISABLED)
+
+    def prepend_block(self):
+        """Load the block before the window, trimming the end of the window if needed."""
+        if self.first <= self.bound_first:
+            return
+        new_first = max(self.bound_first, self.first - self.block_words)
+        new_base, text = self._book_chars(new_first, self.first)
+        self.text_display.config(state=NORMAL)
+        self.text_display.insert('1.0', text)
+        self.first, self.base_char = new_first, new_base
+        if self.last - self.first > self.max_words:
+            self.last = self.first + self.max_words
+            kept = int(self.words.char_starts[self.last]) - self.base_char
+            self.text_display.delete(f"1.{kept}", 'end-1c')
+        self.text_display.config(state=DISABLED)
+
+    def ensure_loaded(self, index):
+        """Make sure word index is in the widget, with a block of context after it where possible.
+
+        Playback moving forward slides the window one block at a time; a jump
+        further than a block (a seek) renders a new window around the word.
+        A word of another chapter switches the view to that chapter.
+        """
+        if self.chapters is not None and not self.bound_first <= index < self.bound_last:
+            self.show_chapter(self.chapters.chapter_of(index), index)
+        elif not self.contains(index):
+            if self.last <= index < self.last + self.block_words:
+                self.append_block()
+            elif self.first - self.block_words <= index < self.first:
+                self.prepend_block()
+            if not self.contains(index):
+                self.render_around(index)
+        elif index >= self.last - self.block_words // 2:
+            self.append_block()
+
+    def char_index(self, char_offset):
+        """Tk index of a book character offset inside the window (line 1, column relative to the window)."""
+        return f"1.{char_offset - self.base_char}"
+
+    def word_range(self, index):
+        """Tk start and end indices of word index, which must be loaded."""
+        return (self.char_index(int(self.words.char_starts[index])),
+                self.char_index(int(self.words.char_ends[index])))
+
+    def highlight(self, index):
+        """Move the highlight to word index, touching only the old and the new word."""
+        self.ensure_loaded(index)
+        start, end = self.word_range(index)
+        # Tags can be changed while the widget is disabled, so no state flips are needed
+        self.text_display.tag_remove(HIGHLIGHT_TAG, HIGHLIGHT_START_MARK, HIGHLIGHT_END_MARK)
+        self.text_display.tag_add(HIGHLIGHT_TAG, start, end)
+        self.text_display.mark_set(HIGHLIGHT_START_MARK, start)
+        self.text_display.mark_set(HIGHLIGHT_END_MARK, end)
+        self.highlighted = index
+
+        # bbox is None for characters outside the visible area
+        last_char = self.char_index(max(int(self.words.char_ends[index]) - 1, int(self.words.char_starts[index])))
+        if self.text_display.bbox(start) is None or self.text_display.bbox(last_char) is None:
+            self.text_display.see(start)
+
+    def clear_highlight(self):
+        """Remove the highlight from the word that has it."""
+        self.text_display.tag_remove(HIGHLIGHT_TAG, HIGHLIGHT_START_MARK, HIGHLIGHT_END_MARK)
+        self.highlighted = None
+
+    def _on_scroll(self, first, last):
+        """yscrollcommand hook: load more text when the user scrolls to either end of the window."""
+        first, last = float(first), float(last)
+        if self._load_pending:
+            return
+        if first <= 0.0 and self.first > self.bound_first:
+            self._load_pending = True
+            self.text_display.after_idle(self._load_more, -1)
+        elif last >= 1.0 and self.last < self.bound_last:
+            self._load_pending = True
+            self.text_display.after_idle(self._load_more, 1)
+
+    def _load_more(self, direction):
+        self._load_pending = False
+        # Keep the text under the top of the view in place while blocks move around it
+        top_column = int(self.text_display.index('@0,0').split('.')[1])
+        top_char = self.base_char + top_column
+        if direction < 0:
+            self.prepend_block()
+        else:
+            self.append_block()
+        top_char = max(top_char, self.base_char)
+        self.text_display.see(self.char_index(top_char))
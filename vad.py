@@ -0,0 +1,111 @@
+"""Offline energy-based voice activity detection for 16 kHz mono audio.
+
+Audiobooks carry long silences, chapter-break pauses and intro music. Sending
+them to Whisper costs inference time and invites hallucinated words, so
+before a chunk is transcribed its speech regions are found from frame
+energies, the regions are joined into one shorter array, and the timestamps
+of the result are mapped back onto the original timeline.
+
+The threshold adapts to each chunk: it sits a margin above the chunk's noise
+floor (a low percentile of frame energies), but never so high that the
+quieter half of normal speech would be cut, and never below an absolute
+floor. Short pauses inside speech are kept, short bursts of noise are
+dropped, and every region is padded so word onsets and endings survive.
+Energy alone cannot tell music from speech, so loud music is still sent to
+the model.
+"""
+import bisect
+
+import numpy as np
+
+from common import SAMPLE_RATE, SEEK_FRAMES_PER_SECOND
+
+FRAME_MS = 30
+MARGIN_DB = 12  # Threshold above the noise floor
+FLOOR_DB = -55  # Frames quieter than this (dBFS) are never speech
+HEADROOM_DB = 25  # Threshold at most this far below the loud frames
+MIN_SPEECH_MS = 200  # Shorter bursts are treated as noise
+MIN_SILENCE_MS = 600  # Shorter pauses are kept as part of the speech
+PAD_MS = 250  # Audio kept on both sides of each region
+
+def frame_energies_db(samples, frame_size):
+    """RMS energy of each full frame of int16 samples, in dBFS."""
+    count = len(samples) // frame_size
+    frames = samples[:count * frame_size].astype(np.float32).reshape(count, frame_size) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20.0 * np.log10(rms + 1e-10)
+
+def _runs(mask):
+    """Return (starts, ends) of the runs of True in a boolean array."""
+    edges = np.diff(np.concatenate(([False], mask, [False])).astype(np.int8))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def speech_regions(samples, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS, min_speech_ms=MIN_SPEECH_MS,
+                   min_silence_ms=MIN_SILENCE_MS, pad_ms=PAD_MS):
+    """Return the speech regions of int16 samples as sorted, disjoint (start, end) sample ranges."""
+    frame_size = int(sample_rate * frame_ms / 1000)
+    energies = frame_energies_db(samples, frame_size)
+    if not len(energies):
+        return []
+    noise_floor = np.percentile(energies, 10)
+    loud = np.percentile(energies, 95)
+    threshold = max(FLOOR_DB, min(noise_floor + MARGIN_DB, loud - HEADROOM_DB))
+    speech = energies > threshold
+
+    # Fill pauses shorter than min_silence_ms between two stretches of speech
+    starts, ends = _runs(~speech)
+    for start, end in zip(starts, ends):
+        if start > 0 and end < len(speech) and (end - start) * frame_ms < min_silence_ms:
+            speech[start:end] = True
+
+    regions = []
+    pad = int(sample_rate * pad_ms / 1000)
+    for start, end in zip(*_runs(speech)):
+        if (end - start) * frame_ms < min_speech_ms:
+            continue
+        start = max(0, int(start) * frame_size - pad)
+        end = min(len(samples), int(end) * frame_size + pad)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+def remove_silence(samples, sample_rate=SAMPLE_RATE):
+    """Join the speech regions of samples into one array.
+
+    Returns (speech_samples, timeline), where timeline lists (speech_start,
+    original_start) in seconds for each region, for restore_timestamps.
+    """
+    regions = speech_regions(samples, sample_rate)
+    timeline = []
+    position = 0
+    for start, end in regions:
+        timeline.append((position / sample_rate, start / sample_rate))
+        position += end - start
+    if not regions:
+        return samples[:0], timeline
+    return np.concatenate([samples[start:end] for start, end in regions]), timeline
+
+def _to_original(time, timeline, speech_starts, is_end=False):
+    # An end time on a region boundary belongs to the region before it
+    search = bisect.bisect_left if is_end else bisect.bisect_right
+    index = max(0, search(speech_starts, time) - 1)
+    speech_start, original_start = timeline[index]
+    return round(original_start + time - speech_start, 2)
+
+def restore_timestamps(result, timeline):
+    """Map the times of a whisper result on the joined speech back to the original audio."""
+    if not timeline:
+        return result
+    speech_starts = [speech_start for speech_start, _ in timeline]
+    for segment in result.get('segments', []):
+        segment['start'] = _to_original(segment['start'], timeline, speech_starts)
+        segment['end'] = _to_original(segment['end'], timeline, speech_starts, is_end=True)
+        if 'seek' in segment:
+            seek = _to_original(segment['seek'] / SEEK_FRAMES_PER_SECOND, timeline, speech_starts)
+            segment['seek'] = int(round(seek * SEEK_FRAMES_PER_SECOND))
+        for word in segment.get('words', []):
+            word['start'] = _to_original(word['start'], timeline, speech_starts)
+            word['end'] = _to_original(word['end'], timeline, speech_starts, is_end=True)
+    return result
@@ -0,0 +1,111 @@
+"""Array-backed table of the words of a transcription.
+
+Instead of one dict per word, a WordTable keeps contiguous typed arrays of
+start and end times and of character offsets into a single joined transcript
+string, where each word is followed by one space. A million-word book takes
+a few tens of MB, and looking up the word at a playback time is a binary
+search over one float array.
+"""
+import numpy as np
+
+TIME_DTYPE = np.dtype("<f8")
+CHAR_DTYPE = np.dtype("<u4")
+
+def iter_words(data):
+    """Yield (text, start, end) for every word of a whisper result, as the player shows it."""
+    for segment in data.get('segments', []):
+        for word_info in segment.get('words', []):
+            yield (word_info.get('text', '').strip(),
+                   float(word_info.get('start', 0)),
+                   float(word_info.get('end', 0)))
+
+class WordTable:
+    """Words of a transcript as columns: starts, ends, char_starts, char_ends and text.
+
+    Lookups by time follow one rule everywhere: the current word at time t is
+    the last word that started at or before t. Inside a word that is the word
+    itself; in a gap between two words it is the word just spoken, so the
+    highlight stays put until the next word starts instead of disappearing.
+    Before the first word there is no current word (-1).
+    """
+
+    def __init__(self, starts, ends, char_starts, char_ends, text):
+        self.starts = starts
+        self.ends = ends
+        self.char_starts = char_starts
+        self.char_ends = char_ends
+        self.text = text
+        # Whisper occasionally emits a word starting before its predecessor;
+        # searching a non-decreasing copy keeps the binary search well defined
+        if len(starts) > 1 and np.any(starts[1:] < starts[:-1]):
+            self._search_starts = np.maximum.accumulate(starts)
+        else:
+            self._search_starts = starts
+
+    @classmethod
+    def from_words(cls, words):
+        """Build a table from (text, start, end) tuples, see iter_words."""
+        words = list(words)
+        count = len(words)
+        starts = np.fromiter((word[1] for word in words), dtype=TIME_DTYPE, count=count)
+        ends = np.fromiter((word[2] for word in words), dtype=TIME_DTYPE, count=count)
+        lengths = np.fromiter((len(word[0]) for word in words), dtype=np.int64, count=count)
+        # Each word is followed by one space in the joined transcript
+        char_starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1])) if count else lengths
+        char_ends = char_starts + lengths
+        text = ' '.join(word[0] for word in words)
+        return cls(starts, ends, char_starts.astype(CHAR_DTYPE), char_ends.astype(CHAR_DTYPE), text)
+
+    @classmethod
+    def from_result(cls, data):
+        """Build a table from a whisper result (the parsed transcription JSON)."""
+        return cls.from_words(iter_words(data))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def word(self, i):
+        """Return the text of word i, sliced out of the joined transcript."""
+        return self.text[int(self.char_starts[i]):int(self.char_ends[i])]
+
+    def __getitem__(self, i):
+        """Return word i as a dict, in the format of the original per-word dicts."""
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("word index out of range")
+        return {
+            'word': self.word(i),
+            'start_time': float(self.starts[i]),
+            'end_time': float(self.ends[i]),
+            'char_index_start': int(self.char_starts[i]),
+            'char_index_end': int(self.char_ends[i]),
+        }
+
+    def find(self, current_time):
+        """Return the index of the current word at current_time, or -1 before the first word."""
+        return int(np.searchsorted(self._search_starts, current_time, side='right')) - 1
+
+    def find_many(self, times):
+        """Vectorised find: the current word index for each time in times (-1 before the first word)."""
+        return np.searchsorted(self._search_starts, np.asarray(times, dtype=TIME_DTYPE), side='right') - 1
+
+    def first_starting_at(self, times):
+        """Vectorised: the index of the first word starting at or after each time in times (len(self) if none)."""
+        return np.searchsorted(self._search_starts, np.asarray(times, dtype=TIME_DTYPE), side='left')
+
+    def slice(self, first, last):
+        """Words first..last-1 as a table of their own, with character offsets into its own text."""
+        if first >= last:
+            return WordTable.from_words([])
+        base = int(self.char_starts[first])
+        return WordTable(self.starts[first:last], self.ends[first:last],
+                         (self.char_starts[first:last] - base).astype(CHAR_DTYPE),
+                         (self.char_ends[first:last] - base).astype(CHAR_DTYPE),
+                         self.text[base:int(self.char_ends[last - 1])])
+
+    def next_change(self, i):
+        """Return the time at which the current word stops being word i (inf after the last word)."""
+        if i + 1 < len(self):
+            return float(self._search_starts[i + 1])
+        return float('inf')